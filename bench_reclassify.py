@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+# bench_reclassify.py
+"""
+Benchmark for --reclassify (main.reclassify_store) on synthetic listings of realistic size.
+
+Builds N rows with ~80-word descriptions drawn from a Zipf-distributed vocabulary and a search
+with a few hundred forbidden words (some of them phrases), then times:
+  - naive:  one plain "a|b|c|..." alternation per row (the filter matching before the trie)
+  - rows:   passes_filters row by row (trie-compiled filters)
+  - batch:  reclassify_store (vocabulary/token-set matching)
+and checks that all three give the same verdicts.
+
+Usage:
+  python bench_reclassify.py                          # 30000 rows, 80 words, 250 forbidden words
+  python bench_reclassify.py --rows 50000 --words 120
+  python bench_reclassify.py --skip-naive --max-s 5   # exit 1 when reclassify_store exceeds 5 s
+"""
+
+import argparse
+import copy
+import itertools
+import random
+import re
+import sys
+import time
+
+import main
+
+LETTERS = "abcdefghijklmnoprstuwyz"
+
+def make_word(rng, shortest=3):
+    return "".join(rng.choice(LETTERS) for _ in range(rng.randint(shortest, 12)))
+
+def make_rows(rng, n_rows, n_words, vocab_size):
+    vocab = [make_word(rng) for _ in range(vocab_size)]
+    cum_weights = list(itertools.accumulate(1.0 / (rank + 1) for rank in range(vocab_size)))
+    rows = []
+    for i in range(n_rows):
+        length = max(10, int(rng.gauss(n_words, n_words / 3)))
+        rows.append({
+            "Title": " ".join(rng.choices(vocab, cum_weights=cum_weights, k=6)),
+            "Description": " ".join(rng.choices(vocab, cum_weights=cum_weights, k=length)),
+            "Price": f"{rng.randint(50, 5000)} zł",
+            "Link": f"https://www.olx.pl/d/oferta/bench-ID{i}.html",
+            "NormLink": f"https://www.olx.pl/d/oferta/bench-ID{i}.html",
+            "Timestamp": i,
+            "SearchName": "bench",
+            "Searches": {"bench": True},
+        })
+    return vocab, rows
+
+def make_search(rng, vocab, n_forbidden):
+    # mostly real but uncommon words, some unseen ones and a few two-word phrases
+    forbidden = rng.sample(vocab[2000:], n_forbidden // 2)
+    forbidden += [make_word(rng, 5) for _ in range(n_forbidden // 2 - 5)]
+    forbidden += [" ".join(rng.sample(vocab[:300], 2)) for _ in range(5)]
+    return {"name": "bench", "forbidden_words": forbidden, "required_words": [],
+            "max_price": 4000, "min_price": None}
+
+def naive_verdicts(rows, conf):
+    words = [main.normalize_text(w) for w in conf["forbidden_words"]]
+    pattern = re.compile("|".join(re.escape(w) for w in words))
+    out = []
+    for row in rows:
+        text = main.normalize_text(row["Title"] + " " + row["Description"])
+        price = main.filter_price(row["Price"])
+        out.append(not pattern.search(text) and not (price is not None and price > conf["max_price"]))
+    return out
+
+def main_bench():
+    parser = argparse.ArgumentParser(description="Benchmark offline re-classification on synthetic listings")
+    parser.add_argument("--rows", type=int, default=30000)
+    parser.add_argument("--words", type=int, default=80, help="mean description length in words")
+    parser.add_argument("--vocab", type=int, default=40000, help="vocabulary size")
+    parser.add_argument("--forbidden", type=int, default=250, help="forbidden words in the search")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--skip-naive", action="store_true", help="skip the slow plain-alternation baseline")
+    parser.add_argument("--max-s", type=float, default=None, help="fail when reclassify_store takes longer")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    vocab, rows = make_rows(rng, args.rows, args.words, args.vocab)
+    conf = make_search(rng, vocab, args.forbidden)
+    size_mb = sum(len(r["Title"]) + len(r["Description"]) for r in rows) / 1e6
+    print(f"📦 {len(rows)} rows, {size_mb:.1f} MB of text, {len(conf['forbidden_words'])} forbidden words")
+
+    if not args.skip_naive:
+        started = time.perf_counter()
+        naive = naive_verdicts(rows, conf)
+        print(f"⏱️ naive alternation, row by row: {time.perf_counter() - started:.2f} s")
+
+    started = time.perf_counter()
+    per_row = [main.passes_filters({"title": r["Title"], "description": r["Description"], "price": r["Price"]}, conf)
+               for r in rows]
+    print(f"⏱️ passes_filters, row by row:    {time.perf_counter() - started:.2f} s")
+
+    store = {"accepted_json": copy.deepcopy(rows), "rejected_json": []}
+    started = time.perf_counter()
+    diff = main.reclassify_store(store, [conf])
+    batch_s = time.perf_counter() - started
+    print(f"⏱️ reclassify_store (batch):      {batch_s:.2f} s "
+          f"({len(diff['to_rejected'])} rows -> rejected)")
+
+    batch = {r["Link"]: r["Searches"]["bench"] for r in store["accepted_json"] + store["rejected_json"]}
+    batch = [batch[r["Link"]] for r in rows]
+    if batch != per_row or (not args.skip_naive and naive != per_row):
+        print("❌ Verdicts differ between the methods")
+        return 1
+    print("✅ Same verdicts from every method.")
+
+    if args.max_s is not None and batch_s > args.max_s:
+        print(f"❌ Re-classification budget exceeded: {batch_s:.2f} s > {args.max_s:.2f} s")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main_bench())
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+# bench_startup.py
+"""
+Startup benchmark for main.py based on `python -X importtime`.
+
+Imports main.py in a fresh interpreter several times and reports the median import cost,
+the slowest top-level imports and whether any heavy module was loaded at startup
+(requests/bs4/openpyxl/pandas should only be imported by the phases that use them).
+
+Usage:
+  python bench_startup.py                 # 5 runs, top 15 imports
+  python bench_startup.py -n 10 --top 25
+  python bench_startup.py --max-ms 300    # exit 1 when the median import of main exceeds 300 ms
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+HEAVY_MODULES = ("requests", "bs4", "openpyxl", "pandas", "numpy")
+
+def run_importtime():
+    """Import main in a fresh interpreter; return [(self_us, cumulative_us, depth, module)]."""
+    here = os.path.dirname(os.path.abspath(__file__))
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=here, capture_output=True, text=True
+    )
+    if proc.returncode != 0:
+        print(proc.stderr[-2000:])
+        raise SystemExit("❌ import main failed")
+    rows = []
+    for line in proc.stderr.splitlines():
+        # "import time:       123 |        456 |   module.name"
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        parts = line.split(":", 1)[1].split("|")
+        if len(parts) != 3:
+            continue
+        self_us, cum_us, name = parts
+        depth = (len(name) - 1 - len(name.lstrip())) // 2
+        rows.append((int(self_us), int(cum_us), depth, name.strip()))
+    return rows
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure main.py import/startup time with -X importtime")
+    parser.add_argument("-n", "--runs", type=int, default=5, help="number of fresh-interpreter runs")
+    parser.add_argument("--top", type=int, default=15, help="how many of the slowest imports to list")
+    parser.add_argument("--max-ms", type=float, default=None, help="fail when the median import of main exceeds this")
+    args = parser.parse_args()
+
+    totals = []
+    last = []
+    for _ in range(args.runs):
+        last = run_importtime()
+        main_rows = [r for r in last if r[3] == "main"]
+        totals.append(main_rows[-1][1] / 1000.0 if main_rows else 0.0)
+
+    median_ms = statistics.median(totals)
+    print(f"⏱️ import main: median {median_ms:.1f} ms over {args.runs} runs (min {min(totals):.1f}, max {max(totals):.1f})")
+
+    print("\nSlowest imports (cumulative, last run):")
+    for self_us, cum_us, depth, name in sorted(last, key=lambda r: r[1], reverse=True)[:args.top]:
+        print(f"  {cum_us / 1000.0:8.1f} ms  {self_us / 1000.0:8.1f} ms self  {'  ' * depth}{name}")
+
+    loaded = sorted({r[3].split(".")[0] for r in last} & set(HEAVY_MODULES))
+    if loaded:
+        print(f"\n⚠️ Heavy modules imported at startup: {', '.join(loaded)}")
+    else:
+        print("\n✅ No heavy modules imported at startup.")
+
+    if args.max_ms is not None and median_ms > args.max_ms:
+        print(f"❌ Startup budget exceeded: {median_ms:.1f} ms > {args.max_ms:.1f} ms")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
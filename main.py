@@ -4,7 +4,10 @@
 Scraper OLX -> Excel + OneDrive + Telegram notifications (accepted/rejected).
 
 Requirements:
-  pip install requests beautifulsoup4 pandas openpyxl python-dotenv
+  pip install requests beautifulsoup4 openpyxl python-dotenv
+
+Heavy modules (requests, bs4, openpyxl) are imported lazily by the phases that need them;
+pandas is not needed. Without openpyxl only the JSON files are written.
 
 Environment variables (set as GitHub Secrets):
   ONEDRIVE_CLIENT_ID
@@ -14,21 +17,67 @@ Environment variables (set as GitHub Secrets):
 
 Optional:
   ONEDRIVE_UPLOAD_FOLDER (e.g. "olx") - folder name in OneDrive root where files will be stored
+  KEEP_MISSING - runs an ad may be missing before it is removed (default 10)
+  POLL_INTERVAL - daemon mode: default seconds between polls of a search (default 1800)
+  POLL_JITTER - daemon mode: random +/- fraction applied to each interval (default 0.2)
+  INCREMENTAL_SCAN - "1": sort newest-first and stop paginating at known ads older than the
+                     per-URL high-water mark (default "0")
+  FULL_SWEEP_EVERY - incremental mode: walk all pages every N runs of a search (default 6)
+  SIM_THRESHOLD - estimated text similarity (0-1) above which a new ad is a repost (default 0.7)
+  SIM_PRICE_TOLERANCE - max relative price difference for a repost (default 0.15)
+  SIM_MIN_SHINGLES - ads with fewer word pairs are never linked as reposts (default 15)
+  QUEUE_DB - distributed mode: SQLite work queue path (default output/queue.db); other boxes
+             need it on a network filesystem with working file locks (see README)
+  QUEUE_WAL - "1": WAL journal for the queue, only when every worker runs on one host (default "0")
+  LEASE_SECONDS / UNIT_MAX_ATTEMPTS / WORKER_IDLE_EXIT - distributed mode tuning
+  PRICE_DROP_ALERT_PCT - only notify price changes that drop >= N% vs the highest price of the
+                         last PRICE_DROP_WINDOW_DAYS days (default 0 = every price change)
+  PRICE_COMPACT_ROWS - price history records appended before compaction (default 2000)
+  PRICE_RETENTION_DAYS - price history of ads gone from the store and unchanged this long is
+                         pruned at compaction (default 90)
+  COVERAGE_MIN_RATIO / COVERAGE_TOTAL_CAP - a search URL walk that found fewer than RATIO of
+                         the ads OLX reports (capped at CAP) is treated as truncated (0.9 / 1000)
+  VERIFY_BEFORE_PURGE - "1": HEAD-check ads about to be purged, keep those still online (default "0")
+  VERIFY_MAX_PER_RUN - max HEAD checks per run (default 50)
+  SNAPSHOT_EVERY - publish full accepted/rejected files every N runs, deltas otherwise (default 12)
+  PROFILE_SAMPLE_MS / PROFILE_TOP / PROFILE_TRACE_FRAMES - --profile sampling and report tuning
+
+Usage:
+  python main.py            # single run (cron / GitHub workflow)
+  python main.py --daemon   # resident service polling each search on its own interval
+  python main.py --full-sweep   # walk all pages even in incremental mode
+  python main.py --snapshot     # publish full snapshot files instead of a delta this run
+  python main.py --profile      # per-phase cProfile/collapsed stacks/tracemalloc in output/profile/
+  python main.py --reclassify [--dry-run]   # re-judge stored listings after filter changes
+  python main.py --coordinator  # queue a run in QUEUE_DB, work on it, merge and upload
+  python main.py --worker       # extra worker (same box, or another box sharing QUEUE_DB — see README)
+  python main.py --query --search falownik --max-price 500 --since 7d   # JSON query
+  python main.py --serve 8080   # read-only JSON query API (GET /listings?max_price=500&since=7d)
+  python main.py --price-history [LINK] [--search NAME] [--since 30d]   # price history as JSON
 """
 
 import os
+import argparse
+import base64
+import bisect
+import datetime
+import hashlib
+import heapq
 import time
 import random
 import json
-import requests
-import pandas as pd
-import openpyxl
 import re
 import sys
 import tempfile
 import shutil
-from bs4 import BeautifulSoup
-from collections import defaultdict
+import socket
+import sqlite3
+import struct
+import threading
+import zlib
+from array import array
+from collections import Counter, defaultdict
+from contextlib import contextmanager, nullcontext
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -83,7 +132,8 @@ SEARCHES = [
         ],
         "required_words": [],  # if empty -> no requirement, otherwise at least one must appear
         "max_price": None,     # number or None
-        "min_price": None
+        "min_price": None,
+        "interval": None       # daemon mode: seconds between polls (None -> POLL_INTERVAL)
     },
     # {
     #     "name": "sprezarka",
@@ -112,12 +162,61 @@ TELEGRAM_CHAT_ID = os.environ.get("TELEGRAM_CHAT_ID")
 # Missing-count behaviour: number of consecutive runs where an ad was NOT found.
 # After exceeding KEEP_MISSING runs the ad will be removed.
 MISSING_THRESHOLD = int(os.environ.get("KEEP_MISSING", "10"))
+
+# Daemon mode: default poll interval per search (seconds) and random jitter fraction.
+POLL_INTERVAL = int(os.environ.get("POLL_INTERVAL", "1800"))
+POLL_JITTER = float(os.environ.get("POLL_JITTER", "0.2"))
+
+# Incremental scan: searches sorted newest-first, pagination stops at a page of known ads
+# not newer than the URL's high-water mark. Every FULL_SWEEP_EVERY runs of a search all
+# pages are walked again. MissingCount follows per-URL coverage (see coverage_gaps): a walk
+# that stopped early or hit MAX_PAGES with ads still coming ages nothing, one that ran out of
+# results ages rows like a full sweep.
+INCREMENTAL_SCAN = os.environ.get("INCREMENTAL_SCAN", "0") == "1"
+FULL_SWEEP_EVERY = int(os.environ.get("FULL_SWEEP_EVERY", "6"))
+
+# Distributed mode: seconds a claimed unit stays leased, attempts before a unit is failed,
+# and idle seconds after which a worker exits.
+LEASE_SECONDS = int(os.environ.get("LEASE_SECONDS", "300"))
+UNIT_MAX_ATTEMPTS = int(os.environ.get("UNIT_MAX_ATTEMPTS", "3"))
+WORKER_IDLE_EXIT = int(os.environ.get("WORKER_IDLE_EXIT", "120"))
+
+# Price history: append-log records folded into the columnar segment, and the price-drop
+# notification rule (0 = notify every price change; N = only drops of at least N% against the
+# highest price seen in the last PRICE_DROP_WINDOW_DAYS days).
+PRICE_COMPACT_ROWS = int(os.environ.get("PRICE_COMPACT_ROWS", "2000"))
+PRICE_DROP_ALERT_PCT = float(os.environ.get("PRICE_DROP_ALERT_PCT", "0"))
+PRICE_DROP_WINDOW_DAYS = int(os.environ.get("PRICE_DROP_WINDOW_DAYS", "30"))
+# ads no longer in the store whose price has not changed for this many days are pruned
+PRICE_RETENTION_DAYS = int(os.environ.get("PRICE_RETENTION_DAYS", "90"))
+
+# Delta journal: full snapshot of the listing files every N persists, deltas in between.
+SNAPSHOT_EVERY = int(os.environ.get("SNAPSHOT_EVERY", "12"))
+
+# Missing detection: a walked search URL only ages its rows when it was fully covered. A walk
+# that found fewer than COVERAGE_MIN_RATIO of the ads OLX reports (capped at the
+# COVERAGE_TOTAL_CAP ads OLX lets you page through) counts as truncated.
+COVERAGE_MIN_RATIO = float(os.environ.get("COVERAGE_MIN_RATIO", "0.9"))
+COVERAGE_TOTAL_CAP = int(os.environ.get("COVERAGE_TOTAL_CAP", "1000"))
+# "1": HEAD-check ads about to be purged and keep the ones that are still online
+VERIFY_BEFORE_PURGE = os.environ.get("VERIFY_BEFORE_PURGE", "0") == "1"
+VERIFY_MAX_PER_RUN = int(os.environ.get("VERIFY_MAX_PER_RUN", "50"))
+
+# --profile: stack sampling interval, allocation sites per report, tracemalloc frames
+PROFILE_SAMPLE_MS = float(os.environ.get("PROFILE_SAMPLE_MS", "5"))
+PROFILE_TOP = int(os.environ.get("PROFILE_TOP", "25"))
+PROFILE_TRACE_FRAMES = int(os.environ.get("PROFILE_TRACE_FRAMES", "1"))
 # OneDrive paths
 EXCEL_ACCEPTED_ONEDRIVE = f"{ONEDRIVE_UPLOAD_FOLDER}/accepted.xlsx"
 EXCEL_REJECTED_ONEDRIVE = f"{ONEDRIVE_UPLOAD_FOLDER}/rejected.xlsx"
 JSON_ACCEPTED_ONEDRIVE = f"{ONEDRIVE_UPLOAD_FOLDER}/accepted.json"
 JSON_REJECTED_ONEDRIVE = f"{ONEDRIVE_UPLOAD_FOLDER}/rejected.json"
 STATE_ONEDRIVE_PATH = f"{ONEDRIVE_UPLOAD_FOLDER}/state.json"
+PRICE_IDS_ONEDRIVE = f"{ONEDRIVE_UPLOAD_FOLDER}/prices_ids.json"
+PRICE_SEGMENT_ONEDRIVE = f"{ONEDRIVE_UPLOAD_FOLDER}/prices.bin"
+PRICE_TAIL_ONEDRIVE = f"{ONEDRIVE_UPLOAD_FOLDER}/prices.tail"
+SIMINDEX_ONEDRIVE = f"{ONEDRIVE_UPLOAD_FOLDER}/simindex.json"
+JOURNAL_ONEDRIVE_DIR = f"{ONEDRIVE_UPLOAD_FOLDER}/journal"
 
 # Local paths
 EXCEL_ACCEPTED_LOCAL = os.path.join(WORKDIR, "accepted.xlsx")
@@ -125,16 +224,40 @@ EXCEL_REJECTED_LOCAL = os.path.join(WORKDIR, "rejected.xlsx")
 JSON_ACCEPTED_LOCAL = os.path.join(WORKDIR, "accepted.json")
 JSON_REJECTED_LOCAL = os.path.join(WORKDIR, "rejected.json")
 STATE_LOCAL = os.path.join(WORKDIR, "state.json")
+PRICE_IDS_LOCAL = os.path.join(WORKDIR, "prices_ids.json")
+PRICE_SEGMENT_LOCAL = os.path.join(WORKDIR, "prices.bin")
+PRICE_TAIL_LOCAL = os.path.join(WORKDIR, "prices.tail")
+JOURNAL_LOCAL = os.path.join(WORKDIR, "journal.jsonl")
+JOURNAL_LAST_DELTA_LOCAL = os.path.join(WORKDIR, "last_delta.json")
+PROFILE_DIR = os.path.join(WORKDIR, "profile")
+# distributed mode work queue (may be on storage shared by several machines)
+QUEUE_DB = os.environ.get("QUEUE_DB", os.path.join(WORKDIR, "queue.db"))
+# WAL only works when all workers run on the same host as QUEUE_DB
+QUEUE_WAL = os.environ.get("QUEUE_WAL", "0") == "1"
+# cache uploaded with snapshots, missing signatures are computed from the listing rows
+SIMINDEX_LOCAL = os.path.join(WORKDIR, "simindex.json")
+# local read-only query index over accepted/rejected rows (rebuilt from JSON)
+QUERY_DB = os.path.join(WORKDIR, "listings.db")
 
 HEADERS = {
     "User-Agent": "Mozilla/5.0 (compatible; olx-scraper/1.0)",
     "Accept-Language": "pl-PL,pl;q=0.9"
 }
 
+_HTTP_SESSION = None
+
+def http_session():
+    """Shared requests.Session so keep-alive connections are reused across all fetches."""
+    global _HTTP_SESSION
+    if _HTTP_SESSION is None:
+        import requests
+        _HTTP_SESSION = requests.Session()
+    return _HTTP_SESSION
+
 def get_with_retry(url, headers=HEADERS, retries=4, backoff=2.0):
     for i in range(retries):
         try:
-            r = requests.get(url, headers=headers, timeout=15)
+            r = http_session().get(url, headers=headers, timeout=15)
             # debug logging: status and short snippet to detect captcha/block
             if r.status_code != 200:
                 print(f"⚠️ HTTP {r.status_code} for {url} (attempt {i+1}/{retries})")
@@ -238,8 +361,9 @@ def authenticate_onedrive():
         'grant_type': 'refresh_token',
         'scope': 'offline_access Files.ReadWrite.All openid profile'
     }
+    import requests
     try:
-        r = requests.post(TOKEN_URL, data=data, timeout=20)
+        r = http_session().post(TOKEN_URL, data=data, timeout=20)
         r.raise_for_status()
         j = r.json()
         at = j.get("access_token", "")
@@ -249,7 +373,7 @@ def authenticate_onedrive():
         # verify token works by calling a small Graph endpoint
         headers = {"Authorization": f"Bearer {at}"}
         try:
-            test = requests.get("https://graph.microsoft.com/v1.0/me/drive", headers=headers, timeout=10)
+            test = http_session().get("https://graph.microsoft.com/v1.0/me/drive", headers=headers, timeout=10)
             if test.status_code not in (200, 201):
                 print("❌ Graph API rejected token:", test.status_code, test.text)
                 print("Token endpoint response:", j)
@@ -270,6 +394,21 @@ def authenticate_onedrive():
         print("❌ OneDrive auth failed:", e, r.text if 'r' in locals() else "")
         return None
 
+# cached OneDrive token (reused while valid, e.g. across daemon polls)
+_TOKEN_CACHE = {"token": None, "expires_at": 0.0}
+
+def get_onedrive_token(min_valid=300):
+    """Return a cached OneDrive token, re-authenticating when it expires within min_valid seconds."""
+    if not CLIENT_ID or not REFRESH_TOKEN:
+        return None
+    token = _TOKEN_CACHE["token"]
+    if token and time.time() < _TOKEN_CACHE["expires_at"] - min_valid:
+        return token
+    token = authenticate_onedrive()
+    _TOKEN_CACHE["token"] = token
+    _TOKEN_CACHE["expires_at"] = time.time() + int(token.get("expires_in", 3600)) if token else 0.0
+    return token
+
 def upload_to_onedrive_localpath(local_path, onedrive_path, token):
     if token is None:
         print("⚠️ No OneDrive token, skipping upload:", onedrive_path)
@@ -279,7 +418,7 @@ def upload_to_onedrive_localpath(local_path, onedrive_path, token):
     headers = {'Authorization': f"Bearer {access_token}"}
     with open(local_path, "rb") as f:
         data = f.read()
-    r = requests.put(upload_url, headers=headers, data=data, timeout=60)
+    r = http_session().put(upload_url, headers=headers, data=data, timeout=60)
     if r.status_code in (200, 201):
         print("✅ Uploaded to OneDrive:", onedrive_path)
         return True
@@ -287,6 +426,25 @@ def upload_to_onedrive_localpath(local_path, onedrive_path, token):
         print("❌ Upload failed:", r.status_code, r.text)
         return False
 
+def download_optional_from_onedrive(onedrive_path, local_path, token):
+    """Download a file that may not exist yet: "ok", "missing" (HTTP 404) or "failed" (anything else)."""
+    try:
+        r = http_session().get(f'https://graph.microsoft.com/v1.0/me/drive/root:/{onedrive_path}:/content',
+                               headers={'Authorization': f"Bearer {token['access_token']}"}, timeout=60)
+    except Exception as e:
+        print("⚠️ OneDrive download failed:", onedrive_path, e)
+        return "failed"
+    if r.status_code == 200:
+        with open(local_path, "wb") as f:
+            f.write(r.content)
+        print("✅ Downloaded from OneDrive:", onedrive_path)
+        return "ok"
+    if r.status_code == 404:
+        print("ℹ️ File not found on OneDrive:", onedrive_path)
+        return "missing"
+    print("⚠️ OneDrive download failed:", onedrive_path, r.status_code)
+    return "failed"
+
 def download_from_onedrive(onedrive_path, local_path, token):
     if token is None:
         print("⚠️ No OneDrive token, cannot download", onedrive_path)
@@ -294,7 +452,7 @@ def download_from_onedrive(onedrive_path, local_path, token):
     access_token = token['access_token']
     url = f'https://graph.microsoft.com/v1.0/me/drive/root:/{onedrive_path}:/content'
     headers = {'Authorization': f'Bearer {access_token}'}
-    r = requests.get(url, headers=headers, timeout=60)
+    r = http_session().get(url, headers=headers, timeout=60)
     if r.status_code == 200:
         with open(local_path, "wb") as f:
             f.write(r.content)
@@ -304,6 +462,38 @@ def download_from_onedrive(onedrive_path, local_path, token):
         print("ℹ️ File not found on OneDrive (or download failed):", onedrive_path, r.status_code)
         return False
 
+def list_onedrive_folder(onedrive_path, token):
+    """Names of the items in a OneDrive folder ([] when it does not exist, None on error)."""
+    if token is None:
+        return None
+    headers = {'Authorization': f"Bearer {token['access_token']}"}
+    url = f'https://graph.microsoft.com/v1.0/me/drive/root:/{onedrive_path}:/children?$select=name'
+    names = []
+    while url:
+        try:
+            r = http_session().get(url, headers=headers, timeout=30)
+        except Exception as e:
+            print("❌ Listing OneDrive folder failed:", onedrive_path, e)
+            return None
+        if r.status_code == 404:
+            return []
+        if r.status_code != 200:
+            print("❌ Listing OneDrive folder failed:", onedrive_path, r.status_code)
+            return None
+        j = r.json()
+        names += [item["name"] for item in j.get("value", [])]
+        url = j.get("@odata.nextLink")
+    return names
+
+def delete_from_onedrive(onedrive_path, token):
+    headers = {'Authorization': f"Bearer {token['access_token']}"}
+    try:
+        r = http_session().delete(f'https://graph.microsoft.com/v1.0/me/drive/root:/{onedrive_path}', headers=headers, timeout=30)
+        return r.status_code in (200, 204, 404)
+    except Exception as e:
+        print("⚠️ OneDrive delete failed:", onedrive_path, e)
+        return False
+
 def send_telegram_notification(title, price, link, photo_url=None):
     if not TELEGRAM_BOT_TOKEN or not TELEGRAM_CHAT_ID:
         print("⚠️ Telegram not configured — skipping notification.")
@@ -312,7 +502,7 @@ def send_telegram_notification(title, price, link, photo_url=None):
     caption = f"<b>{title}</b>\n{price}\n{link}"
     if photo_url:
         try:
-            r = requests.post(f"{base}/sendPhoto", data={
+            r = http_session().post(f"{base}/sendPhoto", data={
                 "chat_id": TELEGRAM_CHAT_ID,
                 "photo": photo_url,
                 "caption": caption,
@@ -324,7 +514,7 @@ def send_telegram_notification(title, price, link, photo_url=None):
         except Exception:
             pass
     try:
-        r = requests.post(f"{base}/sendMessage", data={
+        r = http_session().post(f"{base}/sendMessage", data={
             "chat_id": TELEGRAM_CHAT_ID,
             "text": caption,
             "parse_mode": "HTML",
@@ -358,7 +548,42 @@ def is_negotiable(price_str):
         return False
     return bool(re.search(r"do\s*negocj", price_str, re.IGNORECASE))
 
+POLISH_MONTHS = {
+    "stycznia": 1, "lutego": 2, "marca": 3, "kwietnia": 4, "maja": 5, "czerwca": 6,
+    "lipca": 7, "sierpnia": 8, "września": 9, "października": 10, "listopada": 11, "grudnia": 12,
+}
+
+def parse_olx_date(loc_date, today=None):
+    """
+    Parse the date part of an OLX 'location - date' string
+    ("Dzisiaj o 12:30", "Wczoraj o 08:10", "Odświeżono dnia 03 grudnia 2025", "03 grudnia 2025").
+    Returns datetime.date or None.
+    """
+    if not loc_date:
+        return None
+    today = today or datetime.date.today()
+    text = loc_date.lower()
+    if "dzisiaj" in text:
+        return today
+    if "wczoraj" in text:
+        return today - datetime.timedelta(days=1)
+    m = re.search(r"(\d{1,2})\s+([^\W\d_]+)\s+(\d{4})", text)
+    if m and m.group(2) in POLISH_MONTHS:
+        try:
+            return datetime.date(int(m.group(3)), POLISH_MONTHS[m.group(2)], int(m.group(1)))
+        except ValueError:
+            return None
+    return None
+
+def newest_first_url(url):
+    """Add OLX 'newest first' ordering to a search URL (unless it already sets an order)."""
+    if "search%5Border%5D" in url or "search[order]" in url:
+        return url
+    return url + ("&" if "?" in url else "?") + "search%5Border%5D=created_at:desc"
+
 def parse_search_page(html):
+    """Ads on one search results page -> (results, total count reported by OLX or None)."""
+    from bs4 import BeautifulSoup
     soup = BeautifulSoup(html, "html.parser")
     # Collect all possible ad containers (l-card, ad-card-title, premium-ad-card, any with "card" in data-cy)
     cards = soup.find_all("div", {"data-cy": re.compile(r"card")})
@@ -388,6 +613,7 @@ def parse_search_page(html):
         })
 
     # Get the total number of ads from OLX (e.g. "We found 797 ads")
+    total_count = None
     count_elem = soup.find("span", {"data-testid": "total-count"})
     if count_elem:
         match = re.search(r"(\d[\d\s]*)", count_elem.get_text())
@@ -399,9 +625,10 @@ def parse_search_page(html):
     else:
         print(f"ℹ️ Scraper found {len(results)} ads on this page (OLX counter not found).")
 
-    return results
+    return results, total_count
 
 def parse_listing_page(html):
+    from bs4 import BeautifulSoup
     soup = BeautifulSoup(html, "html.parser")
     desc_elem = soup.find("div", {"data-cy": "ad_description"})
     if not desc_elem:
@@ -421,36 +648,101 @@ def parse_listing_page(html):
                 image_url = gallery_img["src"]
     return description, image_url
 
+# what normalize_text keeps: runs of [a-z0-9] separated by single spaces
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
 def normalize_text(text):
     text = text.lower()
     text = re.sub(r'[^a-z0-9\s]', ' ', text)
     text = re.sub(r'\s+', ' ', text).strip()
     return text
 
+# compiled word filters, keyed by the word lists they were built from
+_FILTER_CACHE = {}
+_WORD_FILTER_CACHE = {}
+
+def trie_pattern(words):
+    """
+    Regex source matching any of words as a substring, with the words merged into a prefix
+    trie: at each text position the engine follows one branch per character instead of trying
+    every alternative. Only whether something matches is preserved (a word that extends
+    another word is dropped, since the shorter one matches first).
+    """
+    trie = {}
+    for word in words:
+        node = trie
+        for ch in word:
+            if "" in node:
+                break
+            node = node.setdefault(ch, {})
+        else:
+            node.clear()
+            node[""] = True
+
+    def build(node):
+        if "" in node:
+            return ""
+        branches = []
+        single = []
+        for ch, child in sorted(node.items()):
+            sub = build(child)
+            if sub:
+                branches.append(re.escape(ch) + sub)
+            else:
+                single.append(re.escape(ch))
+        if len(single) == 1:
+            branches.append(single[0])
+        elif single:
+            branches.append("[" + "".join(single) + "]")
+        return branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+    return build(trie)
+
+def compile_word_filter(words):
+    """Trie-compiled substring regex for a normalized word list (None when it is empty)."""
+    words = tuple(words)
+    if not words:
+        return None
+    compiled = _WORD_FILTER_CACHE.get(words)
+    if compiled is None:
+        compiled = _WORD_FILTER_CACHE[words] = re.compile(trie_pattern(words))
+    return compiled
+
+def compile_filters(search_conf):
+    """
+    Return (forbidden_re, required_re) for a search: each word list normalized once and
+    compiled into a single substring-matching regex (None when the list is empty).
+    """
+    forbidden = tuple(search_conf.get("forbidden_words", []))
+    required = tuple(search_conf.get("required_words", []))
+    key = (forbidden, required)
+    compiled = _FILTER_CACHE.get(key)
+    if compiled is None:
+        compiled = _FILTER_CACHE[key] = (compile_word_filter(normalize_text(w) for w in forbidden),
+                                         compile_word_filter(normalize_text(w) for w in required))
+    return compiled
+
 def passes_filters(item, search_conf):
     text = normalize_text(item.get("title","") + " " + item.get("description",""))
-    for bad in search_conf.get("forbidden_words", []):
-        if normalize_text(bad) in text:
-            return False
-    reqs = search_conf.get("required_words", [])
-    if reqs and not any(normalize_text(r) in text for r in reqs):
+    forbidden_re, required_re = compile_filters(search_conf)
+    if forbidden_re is not None and forbidden_re.search(text):
         return False
-    price = item.get("price","")
-    if price:
-        digits = "".join(ch for ch in price if ch.isdigit())
-        if digits:
-            try:
-                pnum = int(digits)
-                maxp = search_conf.get("max_price")
-                minp = search_conf.get("min_price")
-                if maxp is not None and pnum > maxp:
-                    return False
-                if minp is not None and pnum < minp:
-                    return False
-            except Exception:
-                pass
+    if required_re is not None and not required_re.search(text):
+        return False
+    pnum = filter_price(item.get("price",""))
+    if pnum is not None:
+        maxp = search_conf.get("max_price")
+        minp = search_conf.get("min_price")
+        if maxp is not None and pnum > maxp:
+            return False
+        if minp is not None and pnum < minp:
+            return False
     return True
 
+def filter_price(price):
+    # price as compared by the filters: all digits of the price text (None when there are none)
+    digits = "".join(ch for ch in (price or "") if ch.isdigit())
+    return int(digits) if digits else None
+
 # Load/Save helpers for Excel/JSON
 def load_json(path):
     if os.path.exists(path):
@@ -465,25 +757,64 @@ def save_json(data, path):
     with open(path, "w", encoding="utf-8") as f:
         json.dump(data, f, ensure_ascii=False, indent=2)
 
-def load_excel(path):
-    if os.path.exists(path):
-        try:
-            return pd.read_excel(path)
-        except Exception:
-            return pd.DataFrame()
-    return pd.DataFrame()
+def excel_available():
+    """True when openpyxl can be imported (checked without importing it)."""
+    import importlib.util
+    return importlib.util.find_spec("openpyxl") is not None
 
-def save_excel(df, path):
-    df.to_excel(path, index=False)
+def write_xlsx(rows, path):
+    """
+    Write a list of dicts as one sheet (header = keys in first-seen order) with auto-sized
+    columns. Uses openpyxl directly: no pandas and no reload of the written file.
+    """
+    from openpyxl import Workbook
+    from openpyxl.cell.cell import ILLEGAL_CHARACTERS_RE
+    from openpyxl.utils import get_column_letter
+
+    columns = list(dict.fromkeys(k for row in rows for k in row))
+    widths = [len(str(c)) for c in columns]
+    table = []
+    for row in rows:
+        values = []
+        for i, col in enumerate(columns):
+            v = row.get(col)
+            if isinstance(v, str):
+                v = ILLEGAL_CHARACTERS_RE.sub("", v)
+            elif isinstance(v, (dict, list)):
+                v = json.dumps(v, ensure_ascii=False)
+            elif v is not None and not isinstance(v, (bool, int, float)):
+                v = str(v)
+            if v:
+                widths[i] = max(widths[i], len(str(v)))
+            values.append(v)
+        table.append(values)
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet()
+    for i, w in enumerate(widths, start=1):
+        ws.column_dimensions[get_column_letter(i)].width = w + 2
+    ws.append(columns)
+    for values in table:
+        ws.append(values)
+    wb.save(path)
+
+def load_excel(path):
+    """Read the first sheet of an .xlsx file back into a list of dicts ([] when missing/unreadable)."""
+    if not os.path.exists(path):
+        return []
     try:
-        wb = openpyxl.load_workbook(path)
-        ws = wb.active
-        for col in ws.columns:
-            max_len = max((len(str(cell.value)) for cell in col if cell.value), default=0)
-            ws.column_dimensions[col[0].column_letter].width = max_len + 2
-        wb.save(path)
-    except Exception as e:
-        print("⚠️ autosize failed:", e)
+        import openpyxl
+        wb = openpyxl.load_workbook(path, read_only=True)
+        rows = wb.active.iter_rows(values_only=True)
+        header = next(rows, None)
+        if not header:
+            return []
+        return [dict(zip(header, values)) for values in rows]
+    except Exception:
+        return []
+
+def save_excel(rows, path):
+    write_xlsx(rows, path)
 
 def normalize_link(url):
     """
@@ -526,21 +857,9 @@ def atomic_save_json(data, path):
         json.dump(data, f, ensure_ascii=False, indent=2)
     os.replace(tmp, path)
 
-def atomic_save_excel(df, path):
+def atomic_save_excel(rows, path):
     # Save first to a temporary file, then replace the target file atomically
-    dirn = os.path.dirname(path) or "."
-    fd, tmp = tempfile.mkstemp(dir=dirn, suffix=".xlsx", prefix=".tmp_")
-    os.close(fd)
-    df.to_excel(tmp, index=False)
-    try:
-        wb = openpyxl.load_workbook(tmp)
-        ws = wb.active
-        for col in ws.columns:
-            max_len = max((len(str(cell.value)) for cell in col if cell.value), default=0)
-            ws.column_dimensions[col[0].column_letter].width = max_len + 2
-        wb.save(tmp)
-    except Exception:
-        pass
+    tmp = write_temp_excel(rows, path)
     os.replace(tmp, path)
 
 def write_temp_json(data, target_path):
@@ -551,20 +870,18 @@ def write_temp_json(data, target_path):
         json.dump(data, f, ensure_ascii=False, indent=2)
     return tmp
 
-def write_temp_excel(df, target_path):
+def copy_to_temp(path):
+    dirn = os.path.dirname(path) or "."
+    fd, tmp = tempfile.mkstemp(dir=dirn, prefix=".tmp_", suffix=os.path.splitext(path)[1])
+    os.close(fd)
+    shutil.copyfile(path, tmp)
+    return tmp
+
+def write_temp_excel(rows, target_path):
     dirn = os.path.dirname(target_path) or "."
     fd, tmp = tempfile.mkstemp(dir=dirn, prefix=".tmp_", suffix=".xlsx")
     os.close(fd)
-    df.to_excel(tmp, index=False)
-    try:
-        wb = openpyxl.load_workbook(tmp)
-        ws = wb.active
-        for col in ws.columns:
-            max_len = max((len(str(cell.value)) for cell in col if cell.value), default=0)
-            ws.column_dimensions[col[0].column_letter].width = max_len + 2
-        wb.save(tmp)
-    except Exception:
-        pass
+    write_xlsx(rows, tmp)
     return tmp
 
 def upload_temps_and_commit(token, tmp_map):
@@ -590,7 +907,7 @@ def upload_temps_and_commit(token, tmp_map):
 
     # verify token is accepted by Graph before uploading files
     try:
-        test = requests.get("https://graph.microsoft.com/v1.0/me/drive", headers=headers, timeout=10)
+        test = http_session().get("https://graph.microsoft.com/v1.0/me/drive", headers=headers, timeout=10)
         if test.status_code not in (200, 201):
             print("❌ Graph API rejected token before upload:", test.status_code, test.text)
             return False
@@ -604,7 +921,7 @@ def upload_temps_and_commit(token, tmp_map):
             upload_url = f'https://graph.microsoft.com/v1.0/me/drive/root:/{onedrive_path}:/content'
             with open(tmp_local, "rb") as f:
                 data = f.read()
-            r = requests.put(upload_url, headers=headers, data=data, timeout=60)
+            r = http_session().put(upload_url, headers=headers, data=data, timeout=60)
             if r.status_code not in (200, 201):
                 print("❌ Upload failed:", r.status_code, r.text)
                 raise RuntimeError(f"Upload failed for {onedrive_path}")
@@ -625,32 +942,792 @@ def upload_temps_and_commit(token, tmp_map):
                 pass
         return False
 
-# ---- Main run ----
-def main():
-    __version__ = "1.0.3"
-    __version_date__ = "2025-12-04"
-    print(f"main.py v{__version__} ({__version_date__})")
+# ---- Profiling (--profile) ----
+# With --profile every run phase is wrapped in profile_phase(name): cProfile (CPU, written as
+# pstats), a stack sampler (wall clock incl. network waits, written as collapsed stacks for
+# flamegraph.pl / speedscope) and tracemalloc (top allocation sites and peak memory of the phase).
+# Repeated phases (daemon polls) accumulate. Reports go to output/profile/ at exit.
+# When profiling is off profile_phase returns a shared nullcontext: no profiler, thread or
+# tracemalloc hook is ever installed.
+
+_PROFILING = None
+
+def enable_profiling():
+    """Turn on phase profiling for this process; reports are written at exit (including SIGTERM)."""
+    global _PROFILING
+    import atexit
+    import tracemalloc
+    import signal
+    if _PROFILING is None:
+        _PROFILING = {"phases": {}, "order": []}
+        tracemalloc.start(PROFILE_TRACE_FRAMES)
+        atexit.register(write_profile_reports)
+        # SIGTERM (systemd stop, kill) ends the process without running atexit handlers;
+        # turn it into a normal exit so a profiled daemon still writes its reports
+        if signal.getsignal(signal.SIGTERM) == signal.SIG_DFL:
+            signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(128 + signum))
+        print(f"🔬 Profiling enabled — reports go to {PROFILE_DIR}/")
+
+def profile_phase(name):
+    if _PROFILING is None:
+        return _NO_PROFILE
+    return _profile_phase(name)
+
+_NO_PROFILE = nullcontext()
+
+def _sample_stacks(thread_id, stacks, stop):
+    """Collect collapsed stacks of thread_id every PROFILE_SAMPLE_MS until stop is set."""
+    interval = PROFILE_SAMPLE_MS / 1000.0
+    while not stop.wait(interval):
+        frame = sys._current_frames().get(thread_id)
+        names = []
+        while frame is not None:
+            code = frame.f_code
+            names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+            frame = frame.f_back
+        if names:
+            stacks[";".join(reversed(names))] += 1
+
+@contextmanager
+def _profile_phase(name):
+    import cProfile
+    import tracemalloc
+    phase = _PROFILING["phases"].get(name)
+    if phase is None:
+        phase = {"profiler": cProfile.Profile(), "stacks": Counter(), "alloc": None,
+                 "wall": 0.0, "calls": 0, "peak": 0}
+        _PROFILING["phases"][name] = phase
+        _PROFILING["order"].append(name)
+    before = tracemalloc.take_snapshot()
+    tracemalloc.reset_peak()
+    stop = threading.Event()
+    sampler = threading.Thread(target=_sample_stacks, args=(threading.get_ident(), phase["stacks"], stop), daemon=True)
+    sampler.start()
+    started = time.perf_counter()
+    phase["profiler"].enable()
+    try:
+        yield
+    finally:
+        phase["profiler"].disable()
+        phase["wall"] += time.perf_counter() - started
+        stop.set()
+        sampler.join()
+        phase["calls"] += 1
+        phase["peak"] = max(phase["peak"], tracemalloc.get_traced_memory()[1])
+        after = tracemalloc.take_snapshot()
+        ignore = [tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, "<frozen importlib._bootstrap*>")]
+        phase["alloc"] = after.filter_traces(ignore).compare_to(before.filter_traces(ignore), "lineno")
+
+def write_profile_reports():
+    """Write <phase>.pstats, <phase>.collapsed and <phase>.alloc.txt and print a summary."""
+    import pstats
+    if not _PROFILING or not _PROFILING["order"]:
+        return
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    print(f"\n🔬 Profile ({PROFILE_DIR}/):")
+    for name in _PROFILING["order"]:
+        phase = _PROFILING["phases"][name]
+        base = os.path.join(PROFILE_DIR, re.sub(r"[^\w.-]+", "_", name))
+        phase["profiler"].dump_stats(base + ".pstats")
+        with open(base + ".collapsed", "w", encoding="utf-8") as f:
+            for stack, count in sorted(phase["stacks"].items()):
+                f.write(f"{stack} {count}\n")
+        with open(base + ".alloc.txt", "w", encoding="utf-8") as f:
+            f.write(f"# {name}: {phase['calls']} call(s), peak traced memory {phase['peak'] / 1e6:.1f} MB\n")
+            f.write(f"# top {PROFILE_TOP} allocation sites by size growth (last call)\n")
+            for stat in (phase["alloc"] or [])[:PROFILE_TOP]:
+                f.write(f"{stat}\n")
+        top = pstats.Stats(phase["profiler"]).stats
+        hottest = sorted(top.items(), key=lambda kv: kv[1][2], reverse=True)[:3]
+        hot = ", ".join(f"{func[2]} {tt:.2f}s" for func, (_, _, tt, _, _) in hottest)
+        print(f" - {name}: {phase['wall']:.2f}s wall over {phase['calls']} call(s), "
+              f"peak {phase['peak'] / 1e6:.1f} MB; self time: {hot}")
+
+# ---- Near-duplicate index (reposted listings) ----
+# One-permutation MinHash over word 2-shingles of title+description: every shingle is hashed
+# once into one of SIM_BINS bins (keeping the minimum per bin), empty bins borrow a donor bin.
+# LSH buckets SIM_BANDS bands of the signature so lookups only compare a few candidates.
+# The 64-bin estimate is noisy on short texts, so it only preselects: a candidate is linked
+# when the exact Jaccard of the shingle sets (rebuilt from the stored row) reaches SIM_THRESHOLD.
+SIM_SHINGLE = 2
+SIM_BINS = 64
+SIM_BANDS = 16
+SIM_THRESHOLD = float(os.environ.get("SIM_THRESHOLD", "0.7"))
+SIM_PRICE_TOLERANCE = float(os.environ.get("SIM_PRICE_TOLERANCE", "0.15"))
+# ads with fewer shingles are too short for a reliable match and are never linked
+SIM_MIN_SHINGLES = int(os.environ.get("SIM_MIN_SHINGLES", "15"))
+# LSH candidates with an estimated similarity this far below SIM_THRESHOLD still get the exact check
+SIM_ESTIMATE_SLACK = 0.15
+
+def listing_shingles(title, description):
+    words = normalize_text(f"{title or ''} {description or ''}").split()
+    if len(words) < SIM_SHINGLE:
+        return set(words)
+    return {" ".join(words[i:i + SIM_SHINGLE]) for i in range(len(words) - SIM_SHINGLE + 1)}
+
+def minhash_signature(shingles):
+    """array('H') of SIM_BINS minimum hash values (one-permutation hashing with densification)."""
+    sig = [None] * SIM_BINS
+    for sh in shingles:
+        h = int.from_bytes(hashlib.blake2b(sh.encode("utf-8"), digest_size=8).digest(), "little")
+        b = h % SIM_BINS
+        v = (h >> 8) & 0xFFFF
+        if sig[b] is None or v < sig[b]:
+            sig[b] = v
+    if any(v is not None for v in sig):
+        for b in range(SIM_BINS):
+            attempt = 0
+            while sig[b] is None:
+                # donor choice depends only on (bin, attempt) so it is the same for every document
+                donor = zlib.crc32(f"{b}:{attempt}".encode()) % SIM_BINS
+                if sig[donor] is not None and donor != b:
+                    sig[b] = sig[donor]
+                attempt += 1
+    return array("H", (v or 0 for v in sig))
+
+def row_shingles(row):
+    # the price-change marker is not part of the ad text
+    title = (row.get("Title") or "").replace(" ⚠️ Price changed", "")
+    return listing_shingles(title, row.get("Description"))
+
+def jaccard(a, b):
+    return len(a & b) / len(a | b) if a or b else 0.0
+
+def _band_keys(sig):
+    rows = SIM_BINS // SIM_BANDS
+    raw = sig.tobytes()
+    width = rows * sig.itemsize
+    return [raw[i * width:(i + 1) * width] for i in range(SIM_BANDS)]
+
+def sim_index_add(index, link, sig):
+    index["sigs"][link] = sig
+    index["dirty"] = True
+    for band, key in zip(index["bands"], _band_keys(sig)):
+        band[key].add(link)
+
+def sim_index_remove(index, link):
+    sig = index["sigs"].pop(link, None)
+    if sig is None:
+        return
+    index["dirty"] = True
+    for band, key in zip(index["bands"], _band_keys(sig)):
+        band[key].discard(link)
+
+def get_sim_index(store):
+    """
+    Near-duplicate index of the store, loaded lazily from SIMINDEX_LOCAL on first use.
+    Signatures missing from the file (new rows, first use) are computed from the stored rows,
+    so the file is a cache that can always be rebuilt. It is uploaded to OneDrive with every
+    snapshot, so fresh checkouts (the GitHub workflow) only compute the rows added since.
+    """
+    index = store.get("simindex")
+    if index is not None:
+        return index
+    index = {"sigs": {}, "bands": [defaultdict(set) for _ in range(SIM_BANDS)]}
+    cached = {}
+    if os.path.exists(SIMINDEX_LOCAL):
+        try:
+            data = load_json(SIMINDEX_LOCAL)
+            if isinstance(data, dict) and data.get("bins") == SIM_BINS:
+                cached = data.get("sigs", {})
+        except Exception:
+            cached = {}
+    computed = 0
+    for row in store["accepted_json"] + store["rejected_json"]:
+        link = row.get("NormLink") or normalize_link(row.get("Link"))
+        if not link or link in index["sigs"]:
+            continue
+        sig = None
+        if link in cached:
+            try:
+                sig = array("H", base64.b64decode(cached[link]))
+            except Exception:
+                sig = None
+        if sig is None or len(sig) != SIM_BINS:
+            sig = minhash_signature(row_shingles(row))
+            computed += 1
+        sim_index_add(index, link, sig)
+    if computed:
+        print(f"ℹ️ Similarity index: computed {computed} signatures ({len(index['sigs'])} indexed).")
+    index["dirty"] = bool(computed) or len(index["sigs"]) != len(cached)
+    store["simindex"] = index
+    return index
+
+def save_sim_index(store):
+    """Write SIMINDEX_LOCAL when the index changed; returns True when it was written."""
+    index = store.get("simindex")
+    if index is None:
+        return False
+    live = set(store["accepted_map"]) | set(store["rejected_map"])
+    for link in [l for l in index["sigs"] if l not in live]:
+        sim_index_remove(index, link)
+    if not index["dirty"]:
+        return False
+    sigs = {link: base64.b64encode(sig.tobytes()).decode("ascii") for link, sig in index["sigs"].items()}
+    atomic_save_json({"bins": SIM_BINS, "sigs": sigs}, SIMINDEX_LOCAL)
+    index["dirty"] = False
+    return True
 
-    print("🚀 OLX scraper starting")
-    token = authenticate_onedrive() if (CLIENT_ID and REFRESH_TOKEN) else None
+def prices_close(a, b, tolerance=SIM_PRICE_TOLERANCE):
+    if a is None or b is None:
+        return a is None and b is None
+    return abs(a - b) <= tolerance * max(a, b, 1)
 
-    # If we have OneDrive token, try to download remote files.
-    # If any download fails AND local file doesn't exist -> abort (and notify).
-    if token:
-        downloads = [
-            (STATE_ONEDRIVE_PATH, STATE_LOCAL),
-            (EXCEL_ACCEPTED_ONEDRIVE, EXCEL_ACCEPTED_LOCAL),
-            (EXCEL_REJECTED_ONEDRIVE, EXCEL_REJECTED_LOCAL),
-            (JSON_ACCEPTED_ONEDRIVE, JSON_ACCEPTED_LOCAL),
-            (JSON_REJECTED_ONEDRIVE, JSON_REJECTED_LOCAL),
-        ]
-        for remote, local in downloads:
-            ok = download_from_onedrive(remote, local, token)
-            if not ok and not os.path.exists(local):
-                abort_with_notification(f"Failed to download required file from OneDrive: {remote} and local {local} missing. Aborting to avoid corrupting data.")
+def find_near_duplicate(store, shingles, sig, price_num, exclude=None):
+    """
+    Return (original_link, row) of the stored listing most similar to the ad with these
+    shingles (exact Jaccard >= SIM_THRESHOLD and a close price), following DuplicateOf to the
+    first posting; else None. Ads with fewer than SIM_MIN_SHINGLES shingles are never matched.
+    """
+    if len(shingles) < SIM_MIN_SHINGLES:
+        return None
+    index = get_sim_index(store)
+    candidates = set()
+    for band, key in zip(index["bands"], _band_keys(sig)):
+        candidates |= band.get(key, set())
+    candidates.discard(exclude)
+    best = None
+    for link in candidates:
+        other = index["sigs"][link]
+        estimate = sum(1 for a, b in zip(sig, other) if a == b) / SIM_BINS
+        if estimate < SIM_THRESHOLD - SIM_ESTIMATE_SLACK:
+            continue
+        row = store["accepted_map"].get(link) or store["rejected_map"].get(link)
+        if row is None or not prices_close(price_num, normalize_price(row.get("Price"))):
+            continue
+        other_shingles = row_shingles(row)
+        if len(other_shingles) < SIM_MIN_SHINGLES:
+            continue
+        score = jaccard(shingles, other_shingles)
+        if score < SIM_THRESHOLD or (best and score <= best[0]):
+            continue
+        best = (score, link, row)
+    if best is None:
+        return None
+    _, link, row = best
+    original = row.get("DuplicateOf") or link
+    original_row = store["accepted_map"].get(original) or store["rejected_map"].get(original)
+    return (original, original_row) if original_row else (link, row)
+
+# ---- Price history (append-only, columnar) ----
+# prices_ids.json maps ad ids (list positions) to normalized links and search names. Ids of
+# ads gone from the store with no change in PRICE_RETENTION_DAYS are pruned at compaction:
+# their observations are dropped and their link/search become "" (ids are never reused).
+# prices.bin is the compacted segment: header + four typed columns sorted by (ad id, ts):
+#   id uint32 | ts uint32 | price int32 (-1 = unknown) | negotiable uint8
+# prices.tail is the append log of (id, ts, price, negotiable) records written since the
+# last compaction; it is folded into the segment every PRICE_COMPACT_ROWS records.
+# An observation is only appended when the price/negotiable flag of an ad changed.
+_PRICE_MAGIC = b"PH01"
+_PRICE_HEADER = struct.Struct("<4sI")
+_PRICE_RECORD = struct.Struct("<IIiB")
+
+def _empty_price_columns():
+    return {"id": array("I"), "ts": array("I"), "price": array("i"), "neg": array("B")}
+
+# set when a price history download failed (not 404): the local copy may be stale or partial
+_PRICE_HISTORY_SYNC = {"failed": False}
+
+def load_price_history():
+    ph = {"links": [], "searches": [], "ids": {}, "seg": _empty_price_columns(),
+          "tail": [], "pending": [], "last": {}, "ids_dirty": False}
+    data = load_json(PRICE_IDS_LOCAL) if os.path.exists(PRICE_IDS_LOCAL) else {}
+    if isinstance(data, dict):
+        ph["links"] = data.get("links", [])
+        ph["searches"] = data.get("searches", [""] * len(ph["links"]))
+        ph["ids"] = {link: i for i, link in enumerate(ph["links"]) if link}
+    if os.path.exists(PRICE_SEGMENT_LOCAL):
+        with open(PRICE_SEGMENT_LOCAL, "rb") as f:
+            raw = f.read()
+        magic, n = _PRICE_HEADER.unpack_from(raw) if len(raw) >= _PRICE_HEADER.size else (None, 0)
+        if magic == _PRICE_MAGIC:
+            offset = _PRICE_HEADER.size
+            for name in ("id", "ts", "price", "neg"):
+                col = ph["seg"][name]
+                size = n * col.itemsize
+                col.frombytes(raw[offset:offset + size])
+                offset += size
+        else:
+            print("⚠️ Price history segment unreadable — starting from the append log only.")
+    if os.path.exists(PRICE_TAIL_LOCAL):
+        with open(PRICE_TAIL_LOCAL, "rb") as f:
+            raw = f.read()
+        usable = len(raw) - len(raw) % _PRICE_RECORD.size  # ignore a torn last record
+        ph["tail"] = list(_PRICE_RECORD.iter_unpack(raw[:usable]))
+    seg = ph["seg"]
+    for i in range(len(seg["id"])):
+        ph["last"][seg["id"][i]] = (seg["price"][i], seg["neg"][i])
+    for ad, _, price, neg in sorted(ph["tail"], key=lambda r: r[1]):
+        ph["last"][ad] = (price, neg)
+    return ph
+
+def get_price_history(store):
+    """Price history of the store, loaded on first use."""
+    if store.get("price_history") is None:
+        store["price_history"] = load_price_history()
+    return store["price_history"]
+
+def price_history_record(ph, link, search_name, price, negotiable, ts=None):
+    """Append an observation for link when its price or negotiable flag changed; returns True if appended."""
+    ad = ph["ids"].get(link)
+    if ad is None:
+        ad = len(ph["links"])
+        ph["links"].append(link)
+        ph["searches"].append(search_name or "")
+        ph["ids"][link] = ad
+        ph["ids_dirty"] = True
+    value = (-1 if price is None else int(price), 1 if negotiable else 0)
+    if ph["last"].get(ad) == value:
+        return False
+    rec = (ad, int(ts if ts is not None else time.time())) + value
+    ph["tail"].append(rec)
+    ph["pending"].append(rec)
+    ph["last"][ad] = value
+    return True
+
+def prune_price_ids(ph, rows, live):
+    """Drop the observations and blank the ids of ads not in live with no change in PRICE_RETENTION_DAYS."""
+    cutoff = int(time.time()) - PRICE_RETENTION_DAYS * 86400
+    latest = {}
+    for ad, ts, _, _ in rows:
+        latest[ad] = max(latest.get(ad, 0), ts)
+    pruned = {ad for ad, ts in latest.items() if ts < cutoff and ph["links"][ad] not in live}
+    if not pruned:
+        return rows
+    for ad in pruned:
+        ph["ids"].pop(ph["links"][ad], None)
+        ph["links"][ad] = ""
+        ph["searches"][ad] = ""
+        ph["last"].pop(ad, None)
+    ph["ids_dirty"] = True
+    print(f"ℹ️ Price history: pruned {len(pruned)} ads gone for more than {PRICE_RETENTION_DAYS} days.")
+    return [r for r in rows if r[0] not in pruned]
+
+def compact_price_history(ph, live=None):
+    """
+    Fold the append log into a new sorted segment (atomic replace), then truncate the log.
+    With live (normalized links still in the store) old ads are pruned, see prune_price_ids.
+    """
+    seg = ph["seg"]
+    # dict.fromkeys drops duplicates but keeps the append order of same-second observations
+    rows = dict.fromkeys(zip(seg["id"], seg["ts"], seg["price"], seg["neg"]))
+    rows.update(dict.fromkeys(ph["tail"]))
+    if live is not None:
+        rows = prune_price_ids(ph, rows, live)
+    cols = _empty_price_columns()
+    for ad, ts, price, neg in sorted(rows, key=lambda r: (r[0], r[1])):
+        cols["id"].append(ad)
+        cols["ts"].append(ts)
+        cols["price"].append(price)
+        cols["neg"].append(neg)
+    dirn = os.path.dirname(PRICE_SEGMENT_LOCAL) or "."
+    fd, tmp = tempfile.mkstemp(dir=dirn, prefix=".tmp_", suffix=".bin")
+    with os.fdopen(fd, "wb") as f:
+        f.write(_PRICE_HEADER.pack(_PRICE_MAGIC, len(cols["id"])))
+        for name in ("id", "ts", "price", "neg"):
+            f.write(cols[name].tobytes())
+    os.replace(tmp, PRICE_SEGMENT_LOCAL)
+    # duplicates from a crash between these two steps are dropped by dict.fromkeys() next time
+    open(PRICE_TAIL_LOCAL, "wb").close()
+    ph["seg"] = cols
+    ph["tail"] = []
+    print(f"ℹ️ Price history compacted ({len(cols['id'])} observations).")
+
+def save_price_history(store):
+    """Write pending price history changes; returns the set of local files that changed."""
+    ph = store.get("price_history")
+    changed = set()
+    if ph is None or _PRICE_HISTORY_SYNC["failed"]:
+        return changed
+    if ph["pending"]:
+        with open(PRICE_TAIL_LOCAL, "ab") as f:
+            f.write(b"".join(_PRICE_RECORD.pack(*rec) for rec in ph["pending"]))
+        ph["pending"] = []
+        changed.add(PRICE_TAIL_LOCAL)
+    if len(ph["tail"]) >= PRICE_COMPACT_ROWS:
+        compact_price_history(ph, live=set(store["accepted_map"]) | set(store["rejected_map"]))
+        changed.update((PRICE_SEGMENT_LOCAL, PRICE_TAIL_LOCAL))
+    # after compaction: a crash in between leaves pruned ids without observations, which is harmless
+    if ph["ids_dirty"]:
+        atomic_save_json({"links": ph["links"], "searches": ph["searches"]}, PRICE_IDS_LOCAL)
+        ph["ids_dirty"] = False
+        changed.add(PRICE_IDS_LOCAL)
+    return changed
+
+def price_series(ph, link, since=None, until=None):
+    """[(ts, price or None, negotiable)] of one ad, oldest first (since inclusive, until exclusive)."""
+    ad = ph["ids"].get(link)
+    if ad is None:
+        return []
+    seg = ph["seg"]
+    lo = bisect.bisect_left(seg["id"], ad)
+    hi = bisect.bisect_right(seg["id"], ad)
+    rows = [(seg["ts"][i], seg["price"][i], seg["neg"][i]) for i in range(lo, hi)]
+    rows += [(ts, price, neg) for a, ts, price, neg in ph["tail"] if a == ad]
+    rows = sorted(dict.fromkeys(rows), key=lambda r: r[0])
+    return [(ts, None if price < 0 else price, bool(neg)) for ts, price, neg in rows
+            if (since is None or ts >= since) and (until is None or ts < until)]
+
+def window_prices(series, since):
+    """
+    Known prices of a series (see price_series) in effect at some point from `since` on: the
+    observations in the window plus the last one before it, since only changes are recorded.
+    """
+    prices = [p for ts, p, _ in series if ts >= since and p is not None]
+    before = [p for ts, p, _ in series if ts < since and p is not None]
+    return prices + before[-1:]
+
+def price_extremes_by_ad(ph, since=None, until=None, search=None):
+    """
+    {link: (min price, max price)} over the prices in effect in [since, until) (the observations
+    in the window plus the last one before it), optionally only ads of one search.
+    Column-wise with numpy when installed, plain array scan otherwise.
+    """
+    seg = ph["seg"]
+    tail = ph["tail"]
+    ids = seg["id"] + array("I", (r[0] for r in tail))
+    ts = seg["ts"] + array("I", (r[1] for r in tail))
+    price = seg["price"] + array("i", (r[2] for r in tail))
+    wanted = None
+    if search is not None:
+        wanted = {i for i, name in enumerate(ph["searches"]) if name == search}
+    lo = since if since is not None else 0
+    hi = until if until is not None else 2 ** 32
+    try:
+        import numpy as np
+    except ImportError:
+        np = None
+    out = {}
+    if np is not None:
+        a_id = np.frombuffer(ids, dtype=np.uint32)
+        a_ts = np.frombuffer(ts, dtype=np.uint32)
+        a_price = np.frombuffer(price, dtype=np.int32)
+        known = a_price >= 0
+        if wanted is not None:
+            known &= np.isin(a_id, np.fromiter(wanted, dtype=np.uint32, count=len(wanted)))
+        mask = known & (a_ts >= lo) & (a_ts < hi)
+        sel_id, sel_price = a_id[mask], a_price[mask]
+        before = known & (a_ts < lo)
+        if before.any():
+            # last observation before the window per ad (stable sort keeps the append order of ties)
+            b_id, b_ts, b_price = a_id[before], a_ts[before], a_price[before]
+            order = np.lexsort((b_ts, b_id))
+            b_id, b_price = b_id[order], b_price[order]
+            last = np.append(b_id[1:] != b_id[:-1], True)
+            sel_id = np.concatenate((sel_id, b_id[last]))
+            sel_price = np.concatenate((sel_price, b_price[last]))
+        if sel_id.size:
+            uniq, inv = np.unique(sel_id, return_inverse=True)
+            mins = np.full(uniq.size, np.iinfo(np.int32).max, dtype=np.int32)
+            maxs = np.full(uniq.size, -1, dtype=np.int32)
+            np.minimum.at(mins, inv, sel_price)
+            np.maximum.at(maxs, inv, sel_price)
+            for ad, mn, mx in zip(uniq.tolist(), mins.tolist(), maxs.tolist()):
+                out[ph["links"][ad]] = (mn, mx)
+        return out
+    carried = {}
+    for ad, t, p in zip(ids, ts, price):
+        if p < 0 or t >= hi or (wanted is not None and ad not in wanted):
+            continue
+        if t < lo:
+            if ad not in carried or t >= carried[ad][0]:
+                carried[ad] = (t, p)
+            continue
+        link = ph["links"][ad]
+        mn, mx = out.get(link, (p, p))
+        out[link] = (min(mn, p), max(mx, p))
+    for ad, (_, p) in carried.items():
+        link = ph["links"][ad]
+        mn, mx = out.get(link, (p, p))
+        out[link] = (min(mn, p), max(mx, p))
+    return out
+
+def price_drop_pct(ph, link, price, now=None, days=None):
+    """
+    Drop of price vs the highest earlier price of link within the last `days`, in percent
+    (None when there is no earlier observation). The latest observation is the current price.
+    The history only records changes, so the last observation before the window (the price
+    in effect when the window starts) counts as well.
+    """
+    now = now or int(time.time())
+    since = now - (days or PRICE_DROP_WINDOW_DAYS) * 86400
+    history = window_prices(price_series(ph, link, until=now + 1)[:-1], since)
+    if price is None or not history:
+        return None
+    ref = max(history)
+    return (ref - price) * 100.0 / ref if ref > 0 else None
+
+def price_history_files():
+    return [
+        (PRICE_IDS_LOCAL, PRICE_IDS_ONEDRIVE),
+        (PRICE_SEGMENT_LOCAL, PRICE_SEGMENT_ONEDRIVE),
+        (PRICE_TAIL_LOCAL, PRICE_TAIL_ONEDRIVE),
+    ]
+
+def sync_price_history(token):
+    """
+    Download the price history files; returns False when any download failed (not 404). The
+    history then stays read-only so a partial copy never overwrites the remote one.
+    """
+    failed = False
+    for local, remote in price_history_files():
+        if download_optional_from_onedrive(remote, local, token) == "failed":
+            failed = True
+    _PRICE_HISTORY_SYNC["failed"] = failed
+    return not failed
+
+def retry_price_history_sync(store, token):
+    """
+    Download the price history again after a failed download. On success the observations this
+    process recorded meanwhile are carried over to the fresh copy and saving resumes.
+    """
+    if not sync_price_history(token):
+        print("⚠️ Price history still not downloadable — not saved or uploaded this run.")
+        return
+    old = store.get("price_history")
+    store["price_history"] = None
+    if old is not None:
+        ph = get_price_history(store)
+        for ad, ts, price, neg in old["pending"]:
+            price_history_record(ph, old["links"][ad], old["searches"][ad], None if price < 0 else price, neg, ts=ts)
+    print("✅ Price history downloaded again — saving and uploading resumes.")
+
+def run_price_history(args):
+    """--price-history [LINK]: one ad's series, or per-ad min/max over --since (default 30d) as JSON."""
+    ph = load_price_history()
+    since = parse_since(args.since or f"{PRICE_DROP_WINDOW_DAYS}d")
+    if args.price_history is not True:
+        link = normalize_link(args.price_history)
+        series = price_series(ph, link)
+        window = window_prices(series, since)
+        out = {"link": link, "series": [{"ts": ts, "price": p, "negotiable": n} for ts, p, n in series],
+               "min": min(window) if window else None, "max": max(window) if window else None}
     else:
-        print("⚠️ No OneDrive token — using local files if present.")
+        ext = price_extremes_by_ad(ph, since=since, search=args.search)
+        out = {"since": since, "search": args.search,
+               "ads": [{"link": link, "min": mn, "max": mx} for link, (mn, mx) in sorted(ext.items(), key=lambda kv: kv[1][0])]}
+    print(json.dumps(out, ensure_ascii=False, indent=2))
+
+# ---- Delta journal ----
+# Between full snapshots (accepted/rejected JSON+XLSX and state.json, every SNAPSHOT_EVERY
+# persists or with --snapshot) each persist only publishes a delta record: rows added,
+# changed, removed and MissingCount-only updates per set, changed last_prices and the small
+# state keys. Deltas are appended to output/journal.jsonl and uploaded as
+# journal/delta-<snapshot run>-<run>.json; the current store is the latest snapshot with the
+# deltas of that snapshot applied in run order.
+# Rows are keyed by normalized link + Timestamp (a repriced ad gets a second row).
+# Snapshot listing files record the snapshot run that wrote them, so when a snapshot upload
+# fails after the listing files but before state.json, the deltas are not replayed twice.
+
+def row_key(row):
+    return f"{row.get('NormLink') or normalize_link(row.get('Link'))}#{row.get('Timestamp')}"
+
+def row_fingerprint(row):
+    body = json.dumps({k: v for k, v in row.items() if k != "MissingCount"}, sort_keys=True, ensure_ascii=False)
+    return hashlib.blake2b(body.encode("utf-8"), digest_size=16).digest()
+
+def journal_baseline(store):
+    """What the published store looks like: per set {row key: (fingerprint, MissingCount)} + last_prices."""
+    return {
+        "accepted": {row_key(r): (row_fingerprint(r), r.get("MissingCount", 0)) for r in store["accepted_json"]},
+        "rejected": {row_key(r): (row_fingerprint(r), r.get("MissingCount", 0)) for r in store["rejected_json"]},
+        "last_prices": dict(store["last_prices"]),
+    }
 
+def build_delta(store, state, run_id):
+    base = store["baseline"]
+    delta = {"run": run_id, "base": state["journal"]["snapshot_run"], "ts": int(time.time())}
+    for name in ("accepted", "rejected"):
+        before = base[name]
+        added, changed, missing = [], [], {}
+        current = set()
+        for row in store[f"{name}_json"]:
+            key = row_key(row)
+            current.add(key)
+            old = before.get(key)
+            if old is None:
+                added.append(row)
+            elif old[0] != row_fingerprint(row):
+                changed.append(row)
+            elif old[1] != row.get("MissingCount", 0):
+                missing[key] = row.get("MissingCount", 0)
+        removed = [key for key in before if key not in current]
+        delta[name] = {"added": added, "changed": changed, "missing": missing, "removed": removed}
+    delta["last_prices"] = {link: price for link, price in store["last_prices"].items()
+                            if base["last_prices"].get(link, object()) != price}
+    delta["state"] = {k: v for k, v in state.items() if k not in ("seen", "last_prices")}
+    return delta
+
+def delta_size(delta):
+    return sum(len(delta[n]["added"]) + len(delta[n]["changed"]) + len(delta[n]["missing"]) + len(delta[n]["removed"])
+               for n in ("accepted", "rejected"))
+
+def apply_delta(listings, state, delta, names=("accepted", "rejected"), with_state=True):
+    """
+    Apply one delta to the sets `names` of {"accepted": rows, "rejected": rows} and, with
+    with_state, to state (in place). Added rows whose key is already present are skipped, so
+    replaying a delta onto rows that already contain it does not duplicate them.
+    """
+    for name in names:
+        d = delta.get(name) or {}
+        removed = set(d.get("removed", []))
+        changed = {row_key(r): r for r in d.get("changed", [])}
+        missing = d.get("missing", {})
+        rows = []
+        for row in listings[name]:
+            key = row_key(row)
+            if key in removed:
+                continue
+            row = changed.get(key, row)
+            if key in missing:
+                row["MissingCount"] = missing[key]
+            rows.append(row)
+        present = {row_key(row) for row in rows}
+        rows.extend(row for row in d.get("added", []) if row_key(row) not in present)
+        listings[name] = rows
+    if with_state:
+        state.update(delta.get("state", {}))
+        state.setdefault("last_prices", {}).update(delta.get("last_prices", {}))
+
+def read_journal(path=None):
+    """Deltas from the local journal (a torn last line from an interrupted append is ignored)."""
+    path = path or JOURNAL_LOCAL
+    deltas = []
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    deltas.append(json.loads(line))
+                except ValueError:
+                    print("⚠️ Skipping unreadable journal line.")
+    return deltas
+
+def load_listing_file(path):
+    """Rows of a snapshot listing file and the snapshot run it belongs to (None for plain row lists)."""
+    data = load_json(path)
+    if isinstance(data, dict):
+        return data.get("rows", []), data.get("snapshot_run")
+    return data, None
+
+def listing_file(rows, snapshot_run):
+    # snapshot listing files carry their snapshot id so a half-published snapshot is detectable
+    return {"snapshot_run": snapshot_run, "rows": rows}
+
+def replay_journal(state):
+    """
+    Latest snapshot files + the local journal deltas recorded on top of them.
+    Each listing file only gets the deltas of the snapshot it was written by, and state the
+    deltas of its own snapshot_run; they differ when a snapshot upload failed halfway.
+    Returns (accepted, rejected, state, consistent) — consistent is False in that case, and the
+    next persist must then publish a full snapshot.
+    """
+    state_snapshot = (state.get("journal") or {}).get("snapshot_run")
+    accepted_json, accepted_snapshot = load_listing_file(JSON_ACCEPTED_LOCAL)
+    rejected_json, rejected_snapshot = load_listing_file(JSON_REJECTED_LOCAL)
+    # files written before they carried a snapshot id belong to state's snapshot
+    bases = {"accepted": accepted_snapshot or state_snapshot, "rejected": rejected_snapshot or state_snapshot}
+    consistent = bases["accepted"] == bases["rejected"] == state_snapshot
+    if not consistent:
+        print(f"⚠️ Snapshot files disagree (state {state_snapshot}, accepted {bases['accepted']}, "
+              f"rejected {bases['rejected']}) — the next persist publishes a full snapshot.")
+    listings = {"accepted": accepted_json, "rejected": rejected_json}
+    applied = 0
+    for delta in sorted(read_journal(), key=lambda d: d.get("run", 0)):
+        base = delta.get("base")
+        if base is None:
+            continue
+        names = [name for name in ("accepted", "rejected") if bases[name] == base]
+        if not names and base != state_snapshot:
+            continue
+        apply_delta(listings, state, delta, names=names, with_state=base == state_snapshot)
+        applied += 1
+    if applied:
+        print(f"ℹ️ Applied {applied} journal deltas on top of snapshot {state_snapshot}.")
+    return listings["accepted"], listings["rejected"], state, consistent
+
+def load_listings():
+    """Current accepted/rejected rows from local files (snapshot + journal), without building a store."""
+    state = load_json(STATE_LOCAL) if os.path.exists(STATE_LOCAL) else {}
+    state = state if isinstance(state, dict) else {}
+    accepted_json, rejected_json, _, _ = replay_journal(state)
+    return accepted_json, rejected_json
+
+def download_journal(token):
+    """Rebuild the local journal from the OneDrive deltas of the downloaded snapshot files."""
+    state = load_json(STATE_LOCAL) if os.path.exists(STATE_LOCAL) else {}
+    snapshot_run = ((state if isinstance(state, dict) else {}).get("journal") or {}).get("snapshot_run")
+    snapshots = {snapshot_run, load_listing_file(JSON_ACCEPTED_LOCAL)[1], load_listing_file(JSON_REJECTED_LOCAL)[1]} - {None}
+    names = list_onedrive_folder(JOURNAL_ONEDRIVE_DIR, token)
+    if names is None:
+        abort_with_notification("Failed to list the OneDrive delta journal. Aborting to avoid publishing on a stale snapshot.")
+    prefixes = tuple(f"delta-{snap}-" for snap in snapshots)
+    deltas = []
+    for name in sorted(n for n in names if prefixes and n.startswith(prefixes)):
+        tmp = os.path.join(WORKDIR, ".tmp_delta.json")
+        if not download_from_onedrive(f"{JOURNAL_ONEDRIVE_DIR}/{name}", tmp, token):
+            abort_with_notification(f"Failed to download journal delta {name}. Aborting to avoid corrupting data.")
+        deltas.append(load_json(tmp))
+        os.remove(tmp)
+    write_journal(deltas)
+    print(f"ℹ️ Journal: {len(deltas)} deltas since snapshot {snapshot_run}.")
+
+def write_journal(deltas):
+    dirn = os.path.dirname(JOURNAL_LOCAL) or "."
+    fd, tmp = tempfile.mkstemp(dir=dirn, prefix=".tmp_", suffix=".jsonl")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        for delta in deltas:
+            f.write(json.dumps(delta, ensure_ascii=False) + "\n")
+    os.replace(tmp, JOURNAL_LOCAL)
+
+def append_journal(delta):
+    with open(JOURNAL_LOCAL, "a", encoding="utf-8") as f:
+        f.write(json.dumps(delta, ensure_ascii=False) + "\n")
+
+def prune_remote_journal(token, snapshot_run):
+    """Best-effort removal of OneDrive deltas that belong to older snapshots."""
+    names = list_onedrive_folder(JOURNAL_ONEDRIVE_DIR, token) or []
+    for name in names:
+        if name.startswith("delta-") and not name.startswith(f"delta-{snapshot_run}-"):
+            delete_from_onedrive(f"{JOURNAL_ONEDRIVE_DIR}/{name}", token)
+
+# ---- Run phases ----
+def prices_equal(a_num, a_raw, b_num, b_raw):
+    # Prefer numeric comparison when both available, fallback to raw string compare
+    if a_num is not None and b_num is not None:
+        return a_num == b_num
+    return (a_raw or "").strip() == (b_raw or "").strip()
+
+def download_store_files(token):
+    """
+    Download state and listing JSON files from OneDrive (the .xlsx files are export-only
+    and rebuilt from JSON on every persist, so they are not downloaded).
+    If any download fails AND local file doesn't exist -> abort (and notify).
+    """
+    downloads = [
+        (STATE_ONEDRIVE_PATH, STATE_LOCAL),
+        (JSON_ACCEPTED_ONEDRIVE, JSON_ACCEPTED_LOCAL),
+        (JSON_REJECTED_ONEDRIVE, JSON_REJECTED_LOCAL),
+    ]
+    for remote, local in downloads:
+        ok = download_from_onedrive(remote, local, token)
+        if not ok and not os.path.exists(local):
+            abort_with_notification(f"Failed to download required file from OneDrive: {remote} and local {local} missing. Aborting to avoid corrupting data.")
+    download_journal(token)
+    # optional: price history (starts empty when missing)
+    if not sync_price_history(token):
+        print("⚠️ Price history could not be downloaded — not saved or uploaded until a later download succeeds.")
+    # optional cache: rebuilt from the listing rows when missing
+    download_from_onedrive(SIMINDEX_ONEDRIVE, SIMINDEX_LOCAL, token)
+
+def build_link_map(json_list):
+    # build map using normalized links as keys (use stored NormLink when available)
+    return {(row.get('NormLink') or normalize_link(row.get('Link'))): row for row in json_list if row.get('Link')}
+
+def load_store():
+    """
+    Load state.json and accepted/rejected listings from WORKDIR into an in-memory store.
+    The store dict is what every run phase reads and updates.
+    """
     # Load previous state if it exists. Keep state_raw = None when no previous state file.
     state_raw = None
     if os.path.exists(STATE_LOCAL):
@@ -664,10 +1741,8 @@ def main():
     # use loaded state when available, otherwise initialize defaults (but mark as no previous run)
     state = state_raw if state_raw else {"seen": [], "last_prices": {}, "last_run": None}
 
-    accepted_json = load_json(JSON_ACCEPTED_LOCAL)
-    rejected_json = load_json(JSON_REJECTED_LOCAL)
-    accepted_df = load_excel(EXCEL_ACCEPTED_LOCAL)
-    rejected_df = load_excel(EXCEL_REJECTED_LOCAL)
+    # latest snapshot + journal deltas recorded since
+    accepted_json, rejected_json, state, consistent = replay_journal(state)
 
     # Ensure MissingCount exists for existing entries
     for row in accepted_json:
@@ -677,242 +1752,629 @@ def main():
         if "MissingCount" not in row:
             row["MissingCount"] = 0
 
-    # build maps using normalized links as keys (use stored NormLink when available)
-    accepted_map = {(row.get('NormLink') or normalize_link(row.get('Link'))): row for row in accepted_json if row.get('Link')}
-    rejected_map = {(row.get('NormLink') or normalize_link(row.get('Link'))): row for row in rejected_json if row.get('Link')}
-
-    last_prices = state.get("last_prices", {})
-
-    # current_links_found will store normalized links
-    current_links_found = set()
-    # seen_in_run avoids processing the same (normalized) link multiple times in one run
-    seen_in_run = set()
-    new_accepted = []
-    new_rejected = []
-    price_changed = []
-
-    for search_conf in SEARCHES:
-        name = search_conf["name"]
-        urls = search_conf.get("urls", [search_conf.get("url")])
-        for base_url in urls:
-            if not base_url:
-                continue
-            print(f"🔎 Searching '{name}' at {base_url}")
+    store = {
+        "has_state": bool(state_raw),
+        "state": state,
+        "accepted_json": accepted_json,
+        "rejected_json": rejected_json,
+        "accepted_map": build_link_map(accepted_json),
+        "rejected_map": build_link_map(rejected_json),
+        "last_prices": state.get("last_prices", {}),
+        # normalized links found by the latest poll of each search
+        "seen_by_search": {},
+        # accepted rows / price changes waiting for a successful persist before notifying
+        "pending_notify": [],
+    }
+    # what the last publish contained; deltas are computed against it (None forces a snapshot)
+    store["baseline"] = journal_baseline(store) if state_raw and consistent else None
+    return store
+
+def new_run():
+    return {
+        # current_links_found will store normalized links
+        "current_links_found": set(),
+        "found_by_search": defaultdict(set),
+        # norm_link -> {"res": first search-page result, "searches": [names of searches that surfaced it]}
+        "candidates": {},
+        # search name -> search config, for every search walked in this run
+        "search_confs": {},
+        "new_accepted": [],
+        "new_rejected": [],
+        "price_changed": [],
+        # search URL -> coverage of its walk (see coverage_entry); rows are aged only for URLs
+        # that were fully covered
+        "coverage": {},
+    }
 
-            page = 1
-            empty_pages = 0
-            all_results = []  # Collect all ads for this search URL
-            while page <= MAX_PAGES and empty_pages < MAX_EMPTY_PAGES:
-                paged = base_url + (f"&page={page}" if "?" in base_url else f"?page={page}")
-                print(" - Fetching", paged)
-                r = get_with_retry(paged)
-                if r is None:
-                    empty_pages += 1
-                    page += 1
-                    time.sleep(random.uniform(1.5, 3.5))
-                    continue
+def page_behind_mark(results, mark_date, store):
+    """True when every ad on a search page is already stored and not newer than mark_date."""
+    for res in results:
+        norm_link = normalize_link(res.get("link"))
+        if not norm_link or (norm_link not in store["accepted_map"] and norm_link not in store["rejected_map"]):
+            return False
+        posted = parse_olx_date(res.get("loc_date"))
+        if posted is None or posted > mark_date:
+            return False
+    return True
 
-                results = parse_search_page(r.text)
-                if not results:
-                    empty_pages += 1
-                    page += 1
-                    time.sleep(random.uniform(1.0, 2.5))
-                    continue
+def register_result(res, name, run, url=None):
+    """
+    Record one search-page result of search `name` (walking search URL `url`) in the run;
+    returns its normalized link.
+    """
+    raw_link = res.get("link")
+    if not raw_link:
+        return None
+    norm_link = normalize_link(raw_link)
+    if not norm_link:
+        return None
+    run["found_by_search"][name].add(norm_link)
+    run["current_links_found"].add(norm_link)
+    if url:
+        coverage_entry(run, url)["links"].add(norm_link)
+
+    # one candidate per listing, remembering every search that surfaced it (and where)
+    cand = run["candidates"].get(norm_link)
+    if cand is None:
+        cand = run["candidates"][norm_link] = {"res": res, "searches": [name], "urls": {}}
+    elif name not in cand["searches"]:
+        cand["searches"].append(name)
+    if url:
+        cand["urls"].setdefault(name, url)
+    return norm_link
+
+def coverage_entry(run, url):
+    """
+    Coverage of one walked search URL: status of every fetched page ("ok", "empty" or
+    "failed"), links found, the total OLX reported and why the walk stopped early (if it did).
+    """
+    cov = run["coverage"].get(url)
+    if cov is None:
+        cov = run["coverage"][url] = {"pages": {}, "links": set(), "total": None, "stopped": None}
+    return cov
+
+def coverage_gaps(cov):
+    """Reasons why a walk may have missed ads of its search URL ([] when fully covered)."""
+    gaps = []
+    if cov["stopped"]:
+        gaps.append(cov["stopped"])
+    failed = sorted(page for page, status in cov["pages"].items() if status == "failed")
+    if failed:
+        gaps.append("failed pages " + ",".join(map(str, failed)))
+    if not any(status == "ok" for status in cov["pages"].values()):
+        # an empty walk only counts when OLX confirmed the search is empty (total 0); without
+        # the counter it may just as well be a block or an error page
+        if cov["total"] != 0 or not cov["pages"]:
+            gaps.append("no results")
+    elif cov["pages"].get(MAX_PAGES) == "ok":
+        # the walk hit the page limit while pages still had ads: whatever comes after was never seen
+        gaps.append(f"page limit reached ({len(cov['links'])} of {cov['total'] or '?'} ads)")
+    elif cov["total"] and not cov["stopped"]:
+        expected = min(cov["total"], COVERAGE_TOTAL_CAP)
+        if len(cov["links"]) < expected * COVERAGE_MIN_RATIO:
+            gaps.append(f"truncated ({len(cov['links'])} of {cov['total']} ads)")
+    return gaps
+
+def walk_search(search_conf, store, run, full_sweep=False):
+    """
+    Walk every search page of one search and register the ads found as run candidates
+    (nothing is fetched or classified here, see classify_candidates).
+    Every page fetch is recorded in the run coverage of its search URL. In incremental mode
+    (INCREMENTAL_SCAN) pagination stops early unless this run is a full sweep; like a failed
+    or truncated walk, that leaves the URL uncovered so its rows are not aged by MissingCount.
+    """
+    name = search_conf["name"]
+    run["search_confs"][name] = search_conf
+    found_by_search = run["found_by_search"][name]
+    urls = search_conf.get("urls", [search_conf.get("url")])
+
+    # high-water marks per base URL and incremental runs since the last full sweep per search
+    hwm = store["state"].setdefault("hwm", {})
+    sweeps = store["state"].setdefault("sweeps", {})
+    incremental = False
+    if INCREMENTAL_SCAN and not full_sweep:
+        incremental = name in sweeps and sweeps[name] < FULL_SWEEP_EVERY - 1
+    sweeps[name] = sweeps.get(name, 0) + 1 if incremental else 0
+    if INCREMENTAL_SCAN:
+        print(f"ℹ️ '{name}': {'incremental scan' if incremental else 'full sweep'}")
+
+    for base_url in urls:
+        if not base_url:
+            continue
+        print(f"🔎 Searching '{name}' at {base_url}")
+        fetch_url = newest_first_url(base_url) if INCREMENTAL_SCAN else base_url
+        mark = hwm.get(base_url) or {}
+        mark_date = datetime.date.fromisoformat(mark["date"]) if mark.get("date") else None
+        newest_date = None
+        newest_link = None
+        cov = coverage_entry(run, base_url)
+
+        page = 1
+        empty_pages = 0
+        all_results = []  # Collect all ads for this search URL
+        while page <= MAX_PAGES and empty_pages < MAX_EMPTY_PAGES:
+            paged = fetch_url + (f"&page={page}" if "?" in fetch_url else f"?page={page}")
+            print(" - Fetching", paged)
+            r = get_with_retry(paged)
+            if r is None:
+                cov["pages"][page] = "failed"
+                empty_pages += 1
+                page += 1
+                time.sleep(random.uniform(1.5, 3.5))
+                continue
 
-                all_results.extend(results)
-                empty_pages = 0
-
-                for res in results:
-                    raw_link = res.get("link")
-                    if not raw_link:
-                        continue
-
-                    norm_link = normalize_link(raw_link)
-                    if not norm_link:
-                        continue
-
-                    # avoid duplicate processing within this run
-                    if norm_link in seen_in_run:
-                        continue
-                    seen_in_run.add(norm_link)
-                    current_links_found.add(norm_link)
-
-                    # Check in accepted/rejected using normalized price comparison
-                    price_raw = res.get("price")
-                    price_num = normalize_price(price_raw)
-                    negotiable = is_negotiable(price_raw)
-
-                    acc_row = accepted_map.get(norm_link)
-                    rej_row = rejected_map.get(norm_link)
-                    acc_price_raw = acc_row.get("Price") if acc_row else None
-                    rej_price_raw = rej_row.get("Price") if rej_row else None
-                    acc_price_num = normalize_price(acc_price_raw)
-                    rej_price_num = normalize_price(rej_price_raw)
-
-                    def prices_equal(a_num, a_raw, b_num, b_raw):
-                        # Prefer numeric comparison when both available, fallback to raw string compare
-                        if a_num is not None and b_num is not None:
-                            return a_num == b_num
-                        return (a_raw or "").strip() == (b_raw or "").strip()
-
-                    in_accepted = acc_row is not None and prices_equal(acc_price_num, acc_price_raw, price_num, price_raw)
-                    in_rejected = rej_row is not None and prices_equal(rej_price_num, rej_price_raw, price_num, price_raw)
-                    price_diff = acc_row is not None and not prices_equal(acc_price_num, acc_price_raw, price_num, price_raw)
-
-                    if (acc_row or rej_row) and (not in_accepted and not in_rejected):
-                        # existing record present but price differs -> debug info
-                        stored = acc_price_raw or rej_price_raw
-                        print(f"ℹ️ Existing record for {norm_link} found but price differs (stored: {stored} vs current: {price_raw}).")
-
-                    if in_accepted or in_rejected:
-                        # Skip fetching the listing page
-                        continue
-
-                    # Fetch listing page
-                    lr = get_with_retry(raw_link)
-                    if lr is None:
-                        continue
-                    description, image_url = parse_listing_page(lr.text)
-                    res["description"] = description
-                    res["image"] = image_url
-                    res["search_name"] = name
-
-                    if passes_filters(res, search_conf):
-                        # Accepted
-                        row = {
-                            "Title": res.get("title",""),
-                            "Price": price_raw,
-                            "Negotiable": negotiable,
-                            "Location/Date": res.get("loc_date",""),
-                            "Description": res.get("description",""),
-                            "Link": raw_link,
-                            "NormLink": norm_link,
-                            "Image": res.get("image"),
-                            "SearchName": name,
-                            "Notified": False,
-                            "MissingCount": 0,
-                            "Timestamp": int(time.time())
-                        }
-                        accepted_json.append(row)
-                        accepted_map[norm_link] = row
-                        new_accepted.append(row)
-                        if price_diff:
-                            row["Title"] += " ⚠️ Price changed"
-                            price_changed.append(row)
-                    else:
-                        # Rejected
-                        row = {
-                            "Title": res.get("title",""),
-                            "Price": price_raw,
-                            "Negotiable": negotiable,
-                            "Location/Date": res.get("loc_date",""),
-                            "Description": description,
-                            "Link": raw_link,
-                            "NormLink": norm_link,
-                            "Image": image_url,
-                            "SearchName": name,
-                            "MissingCount": 0,
-                            "Timestamp": int(time.time())
-                        }
-                        rejected_json.append(row)
-                        rejected_map[norm_link] = row
-                        new_rejected.append(row)
-
-                    # store numeric price when possible
-                    last_prices[norm_link] = price_num if price_num is not None else (price_raw or "")
-
-                    time.sleep(random.uniform(0.8, 1.8))
+            results, total = parse_search_page(r.text)
+            cov["pages"][page] = "ok" if results else "empty"
+            if total is not None:
+                cov["total"] = max(cov["total"] or 0, total)
+            if not results:
+                empty_pages += 1
                 page += 1
-                time.sleep(random.uniform(1.5, 3.0))
+                time.sleep(random.uniform(1.0, 2.5))
+                continue
 
-            # --- SUMMARY FOR THIS SEARCH URL ---
-            unique_links = set(normalize_link(ad["link"]) for ad in all_results if ad.get("link"))
-            print(f"\n📊 Summary for '{name}' ({base_url}):")
-            print(f"Scraper found {len(all_results)} ads (raw, all pages).")
-            print(f"Scraper found {len([u for u in unique_links if u])} unique ads (across all pages).\n")
+            all_results.extend(results)
+            empty_pages = 0
+            stop_here = incremental and mark_date is not None and page_behind_mark(results, mark_date, store)
 
-    # --- REMOVE/UPDATE ENTRIES NOT FOUND IN CURRENT RUN ---
-    # Update MissingCount for entries not found in current run.
-    def update_missing_counters(json_list, threshold=MISSING_THRESHOLD):
-        kept = []
-        removed = 0
-        for row in json_list:
-            link = normalize_link(row.get("Link"))
-            if link in current_links_found:
-                row["MissingCount"] = 0
-                kept.append(row)
+            for res in results:
+                norm_link = register_result(res, name, run, url=base_url)
+                if not norm_link:
+                    continue
+                posted = parse_olx_date(res.get("loc_date"))
+                if posted is not None and (newest_date is None or posted > newest_date):
+                    newest_date, newest_link = posted, norm_link
+
+            if stop_here:
+                print(f"⏹️ Page {page} holds only known ads not newer than {mark_date} — stopping early.")
+                cov["stopped"] = "incremental scan"
+                break
+            page += 1
+            time.sleep(random.uniform(1.5, 3.0))
+
+        if newest_date is not None and (mark_date is None or newest_date >= mark_date):
+            hwm[base_url] = {"date": newest_date.isoformat(), "link": newest_link, "updated": int(time.time())}
+
+        # --- SUMMARY FOR THIS SEARCH URL ---
+        unique_links = set(normalize_link(ad["link"]) for ad in all_results if ad.get("link"))
+        print(f"\n📊 Summary for '{name}' ({base_url}):")
+        print(f"Scraper found {len(all_results)} ads (raw, all pages).")
+        print(f"Scraper found {len([u for u in unique_links if u])} unique ads (across all pages).")
+        gaps = coverage_gaps(cov)
+        print(f"Coverage: {'complete' if not gaps else 'incomplete — ' + '; '.join(gaps)}\n")
+
+    store["seen_by_search"][name] = set(found_by_search)
+
+def fetch_listing_details(link):
+    """Fetch and parse one listing page -> (description, image_url), or None when the fetch failed."""
+    lr = get_with_retry(link)
+    if lr is None:
+        return None
+    details = parse_listing_page(lr.text)
+    time.sleep(random.uniform(0.8, 1.8))
+    return details
+
+def evaluate_searches(item, names, search_confs):
+    """Per-search verdicts {search name: passes_filters} for one listing."""
+    return {n: passes_filters(item, search_confs[n]) for n in names}
+
+def stored_verdicts(row, accepted):
+    # rows written before per-search verdicts only know their own SearchName
+    verdicts = row.get("Searches")
+    if isinstance(verdicts, dict):
+        return dict(verdicts)
+    return {row.get("SearchName"): accepted} if row.get("SearchName") else {}
+
+def classify_candidates(store, run, fetch_details=fetch_listing_details):
+    """
+    Classify this run's candidates. Each listing page is fetched at most once and evaluated
+    against every search that surfaced it; the per-search verdicts are stored in row["Searches"]
+    and the row is accepted when any search accepts it.
+    Stored rows with an unchanged price are not fetched again: searches that have not judged
+    them yet are evaluated against the stored description (a rejected row accepted that way
+    moves to accepted).
+    """
+    accepted_json = store["accepted_json"]
+    rejected_json = store["rejected_json"]
+    accepted_map = store["accepted_map"]
+    rejected_map = store["rejected_map"]
+    last_prices = store["last_prices"]
+    search_confs = run["search_confs"]
+    price_history = get_price_history(store)
+    fetched = 0
+
+    for norm_link, cand in run["candidates"].items():
+        res = cand["res"]
+        names = cand["searches"]
+        raw_link = res.get("link")
+
+        # Check in accepted/rejected using normalized price comparison
+        price_raw = res.get("price")
+        price_num = normalize_price(price_raw)
+        negotiable = is_negotiable(price_raw)
+
+        acc_row = accepted_map.get(norm_link)
+        rej_row = rejected_map.get(norm_link)
+        acc_price_raw = acc_row.get("Price") if acc_row else None
+        rej_price_raw = rej_row.get("Price") if rej_row else None
+        acc_price_num = normalize_price(acc_price_raw)
+        rej_price_num = normalize_price(rej_price_raw)
+
+        in_accepted = acc_row is not None and prices_equal(acc_price_num, acc_price_raw, price_num, price_raw)
+        in_rejected = rej_row is not None and prices_equal(rej_price_num, rej_price_raw, price_num, price_raw)
+        price_diff = acc_row is not None and not prices_equal(acc_price_num, acc_price_raw, price_num, price_raw)
+
+        # price history: seed ads stored before the history existed with their stored price
+        stored_row = acc_row or rej_row
+        if stored_row is not None and norm_link not in price_history["ids"]:
+            price_history_record(price_history, norm_link, stored_row.get("SearchName"),
+                                 normalize_price(stored_row.get("Price")), stored_row.get("Negotiable"),
+                                 ts=int(stored_row.get("Timestamp") or time.time()) - 1)
+        price_history_record(price_history, norm_link, names[0], price_num, negotiable)
+
+        if (acc_row or rej_row) and (not in_accepted and not in_rejected):
+            # existing record present but price differs -> debug info
+            stored = acc_price_raw or rej_price_raw
+            print(f"ℹ️ Existing record for {norm_link} found but price differs (stored: {stored} vs current: {price_raw}).")
+
+        if in_accepted or in_rejected:
+            # Skip fetching the listing page; judge it for searches that have not seen it yet
+            row = acc_row if in_accepted else rej_row
+            # rows stored before coverage tracking learn the search URL they are listed under
+            if not row.get("SourceUrl") and cand["urls"].get(row.get("SearchName")):
+                row["SourceUrl"] = cand["urls"][row.get("SearchName")]
+            verdicts = stored_verdicts(row, in_accepted)
+            new_names = [n for n in names if n not in verdicts]
+            if not new_names:
+                continue
+            item = {"title": row.get("Title", ""), "description": row.get("Description", ""), "price": row.get("Price", "")}
+            verdicts.update(evaluate_searches(item, new_names, search_confs))
+            row["Searches"] = verdicts
+            if not in_accepted and any(verdicts.values()):
+                row["SearchName"] = next(n for n, ok in verdicts.items() if ok)
+                row["SourceUrl"] = cand["urls"].get(row["SearchName"], row.get("SourceUrl"))
+                row["Notified"] = False
+                rejected_json.remove(row)
+                del rejected_map[norm_link]
+                accepted_json.append(row)
+                accepted_map[norm_link] = row
+                run["new_accepted"].append(row)
+            continue
+
+        # Fetch listing page (once, whatever the number of searches that surfaced it)
+        details = fetch_details(raw_link)
+        if details is None:
+            continue
+        fetched += 1
+        description, image_url = details
+        res["description"] = description
+        res["image"] = image_url
+
+        # reposts of a stored listing are judged like any new ad, but linked to the original
+        # (DuplicateOf) and only notified when their price moved
+        shingles = listing_shingles(res.get("title"), description)
+        sig = minhash_signature(shingles)
+        dup = find_near_duplicate(store, shingles, sig, price_num, exclude=norm_link)
+        if dup:
+            original, orig_row = dup
+            print(f"♻️ {norm_link} looks like a repost of {original} — linking instead of treating as new.")
+        verdicts = evaluate_searches(res, names, search_confs)
+        accepted_by = [n for n, ok in verdicts.items() if ok]
+        name = accepted_by[0] if accepted_by else names[0]
+        res["search_name"] = name
+        # search URL whose walk vouches for this row (coverage-based MissingCount)
+        source_url = cand["urls"].get(name) or next(iter(cand["urls"].values()), None)
+
+        if accepted_by:
+            # Accepted
+            row = {
+                "Title": res.get("title",""),
+                "Price": price_raw,
+                "Negotiable": negotiable,
+                "Location/Date": res.get("loc_date",""),
+                "Description": res.get("description",""),
+                "Link": raw_link,
+                "NormLink": norm_link,
+                "Image": res.get("image"),
+                "SearchName": name,
+                "SourceUrl": source_url,
+                "Searches": verdicts,
+                "Notified": False,
+                "MissingCount": 0,
+                "Timestamp": int(time.time())
+            }
+            accepted_json.append(row)
+            accepted_map[norm_link] = row
+            if dup:
+                row["DuplicateOf"] = original
+            if dup and original in accepted_map:
+                # a repost of an accepted ad only deserves a notification when its price moved
+                if prices_equal(normalize_price(orig_row.get("Price")), orig_row.get("Price"), price_num, price_raw):
+                    row["Notified"] = orig_row.get("Notified", False)
+                else:
+                    price_diff = True
             else:
-                row["MissingCount"] = int(row.get("MissingCount", 0)) + 1
-                if row["MissingCount"] >= threshold:
+                run["new_accepted"].append(row)
+            if price_diff:
+                row["Title"] += " ⚠️ Price changed"
+                run["price_changed"].append(row)
+        else:
+            # Rejected
+            row = {
+                "Title": res.get("title",""),
+                "Price": price_raw,
+                "Negotiable": negotiable,
+                "Location/Date": res.get("loc_date",""),
+                "Description": description,
+                "Link": raw_link,
+                "NormLink": norm_link,
+                "Image": image_url,
+                "SearchName": name,
+                "SourceUrl": source_url,
+                "Searches": verdicts,
+                "MissingCount": 0,
+                "Timestamp": int(time.time())
+            }
+            if dup:
+                row["DuplicateOf"] = original
+            rejected_json.append(row)
+            rejected_map[norm_link] = row
+            run["new_rejected"].append(row)
+        sim_index_add(get_sim_index(store), norm_link, sig)
+
+        # store numeric price when possible
+        last_prices[norm_link] = price_num if price_num is not None else (price_raw or "")
+
+    matches = sum(len(c["searches"]) for c in run["candidates"].values())
+    print(f"📊 Classified {len(run['candidates'])} listings ({matches} search matches), fetched {fetched} listing pages.")
+
+def scrape_searches(search_confs, store, run, full_sweep=False):
+    """Walk all given searches, then fetch and classify the union of their listings once."""
+    with profile_phase("walk"):
+        for search_conf in search_confs:
+            walk_search(search_conf, store, run, full_sweep=full_sweep)
+    with profile_phase("classify"):
+        classify_candidates(store, run)
+
+def update_missing_counters(json_list, found_links, threshold=MISSING_THRESHOLD, covered=None, verify=None):
+    """
+    Update MissingCount for entries not found in current run and drop rows reaching threshold.
+    covered: when given, only rows for which covered(row) is true are aged (the others are
+    kept untouched, e.g. rows of search URLs whose walk failed or was cut short).
+    verify: when given, a row reaching threshold is kept (at threshold - 1) if verify(row) is true.
+    """
+    kept = []
+    removed = 0
+    for row in json_list:
+        link = normalize_link(row.get("Link"))
+        if link in found_links:
+            row["MissingCount"] = 0
+            kept.append(row)
+        elif covered is not None and not covered(row):
+            kept.append(row)
+        else:
+            row["MissingCount"] = int(row.get("MissingCount", 0)) + 1
+            if row["MissingCount"] >= threshold:
+                if verify is not None and verify(row):
+                    row["MissingCount"] = threshold - 1
+                    kept.append(row)
+                else:
                     removed += 1
                     # drop the row
-                else:
-                    kept.append(row)
-        return kept, removed
-
-    # Only update/remove if we had previous state (to avoid purging on first run)
-    if state_raw:
-        before_a = len(accepted_json)
-        before_r = len(rejected_json)
-        accepted_json, removed_a = update_missing_counters(accepted_json, MISSING_THRESHOLD)
-        rejected_json, removed_r = update_missing_counters(rejected_json, MISSING_THRESHOLD)
-        print(f"ℹ️ Removed {removed_a} accepted entries and {removed_r} rejected entries (MissingCount >= {MISSING_THRESHOLD}).")
-    else:
-        print("ℹ️ No previous state — skipping removal/update of MissingCount on first run.")
+            else:
+                kept.append(row)
+    return kept, removed
 
-    # When adding new accepted entries, ensure MissingCount is initialised
-    for row in new_accepted:
-        if "MissingCount" not in row:
-            row["MissingCount"] = 0
+def listing_online(link):
+    """HEAD a listing: True when it still answers 200 at its own URL, False when gone, None when unsure."""
+    try:
+        r = http_session().head(link, headers=HEADERS, timeout=10, allow_redirects=True)
+    except Exception as e:
+        print(f"⚠️ HEAD {link} failed: {e}")
+        return None
+    if r.status_code == 200:
+        # removed ads redirect to a search/category page
+        return normalize_link(r.url) == normalize_link(link)
+    if r.status_code in (404, 410):
+        return False
+    return None
 
-    # When adding new rejected entries, ensure MissingCount is initialised
-    for row in new_rejected:
-        if "MissingCount" not in row:
-            row["MissingCount"] = 0
+def purge_verifier():
+    """verify() for update_missing_counters: HEAD-check up to VERIFY_MAX_PER_RUN rows, None when disabled."""
+    if not VERIFY_BEFORE_PURGE:
+        return None
+    budget = {"left": VERIFY_MAX_PER_RUN, "kept": 0}
 
-    # Save state locally only AFTER successful upload to OneDrive.
-    state = {"seen": list(current_links_found), "last_prices": last_prices, "last_run": int(time.time())}
+    def verify(row):
+        if budget["left"] <= 0 or not row.get("Link"):
+            return False
+        budget["left"] -= 1
+        online = listing_online(row["Link"]) is True
+        if online:
+            budget["kept"] += 1
+            print(f"🔎 {row['Link']} is still online — not purging.")
+        time.sleep(random.uniform(0.3, 0.8))
+        return online
+    verify.budget = budget
+    return verify
+
+def apply_missing_counters(store, run, search_names=None):
+    """
+    Age entries not found in this run and purge stale ones. A row is aged only when the search
+    URL it is listed under (SourceUrl, or every URL of its search for older rows) was walked
+    in this run with complete coverage; rows of searches that are no longer configured are aged
+    too unless search_names limits aging to the given searches.
+    """
+    # Only update/remove if we had previous state (to avoid purging on first run)
+    if not store["has_state"]:
+        print("ℹ️ No previous state — skipping removal/update of MissingCount on first run.")
+        return
+    found = run["current_links_found"]
+    gaps = {url: coverage_gaps(cov) for url, cov in run["coverage"].items()}
+    for url, reasons in sorted(gaps.items()):
+        if reasons:
+            print(f"ℹ️ Not aging rows of {url}: {'; '.join(reasons)}")
+    urls_by_search = {conf["name"]: [u for u in conf.get("urls", [conf.get("url")]) if u] for conf in SEARCHES}
+    configured = {u for urls in urls_by_search.values() for u in urls}
+
+    def covered(row):
+        url = row.get("SourceUrl")
+        if url:
+            if url in gaps:
+                return not gaps[url]
+            return search_names is None and url not in configured
+        name = row.get("SearchName")
+        if name not in urls_by_search:
+            return search_names is None
+        if search_names is not None and name not in search_names:
+            return False
+        return all(u in gaps and not gaps[u] for u in urls_by_search[name])
+
+    verify = purge_verifier()
+    store["accepted_json"], removed_a = update_missing_counters(store["accepted_json"], found, MISSING_THRESHOLD, covered, verify)
+    store["rejected_json"], removed_r = update_missing_counters(store["rejected_json"], found, MISSING_THRESHOLD, covered, verify)
+    if removed_a or removed_r:
+        store["accepted_map"] = build_link_map(store["accepted_json"])
+        store["rejected_map"] = build_link_map(store["rejected_json"])
+    if verify is not None:
+        print(f"ℹ️ Verified {VERIFY_MAX_PER_RUN - verify.budget['left']} ads before purging, {verify.budget['kept']} still online.")
+    print(f"ℹ️ Removed {removed_a} accepted entries and {removed_r} rejected entries (MissingCount >= {MISSING_THRESHOLD}).")
+
+def persist_store(store, token, abort=True, snapshot=False):
+    """
+    Publish the store. A full snapshot (state, accepted/rejected JSON and XLSX) is written on
+    the first run, every SNAPSHOT_EVERY persists or when snapshot=True; otherwise only a delta
+    record is appended to the journal (see build_delta).
+    With a OneDrive token the files are uploaded first and committed locally only when every
+    upload succeeded.
+    abort=False reports failures by returning False instead of exiting (daemon mode).
+    """
+    accepted_json = store["accepted_json"]
+    rejected_json = store["rejected_json"]
+    seen = set()
+    for links in store["seen_by_search"].values():
+        seen |= links
+    # run ids order the journal, keep them strictly increasing
+    run_id = max(int(time.time()), (store["state"].get("last_run") or 0) + 1)
+    state = dict(store["state"])
+    state.update({"seen": list(seen), "last_prices": store["last_prices"], "last_run": run_id})
+
+    journal = dict(state.get("journal") or {})
+    snapshot = (snapshot or not store["has_state"] or not journal.get("snapshot_run")
+                or store.get("baseline") is None or journal.get("runs_since_snapshot", 0) + 1 >= SNAPSHOT_EVERY)
+    if snapshot:
+        journal = {"snapshot_run": run_id, "runs_since_snapshot": 0}
+    else:
+        journal["runs_since_snapshot"] = journal.get("runs_since_snapshot", 0) + 1
+    state["journal"] = journal
+    delta = None if snapshot else build_delta(store, state, run_id)
+
+    xlsx = snapshot and excel_available()
+    if snapshot and not xlsx:
+        print("⚠️ openpyxl not installed — writing JSON only (no .xlsx export).")
+
+    # the price history is append-only: new records go to the local log first
+    if token and _PRICE_HISTORY_SYNC["failed"]:
+        retry_price_history_sync(store, token)
+    price_files = save_price_history(store)
+    # the similarity index is a rebuildable cache: written locally, uploaded with snapshots only
+    save_sim_index(store)
+
+    def fail(msg):
+        if abort:
+            abort_with_notification(msg)
+        print("❌", msg)
+        if snapshot:
+            # part of the snapshot may be on OneDrive already: publish a full snapshot next time
+            store["baseline"] = None
+        return False
 
     # If we have OneDrive token -> prepare tmp files + upload, commit only on success.
     if token:
-        # Prepare temp files for upload/commit
-        tmp_state = write_temp_json(state, STATE_LOCAL)
-        tmp_acc_json = write_temp_json(accepted_json, JSON_ACCEPTED_LOCAL)
-        tmp_rej_json = write_temp_json(rejected_json, JSON_REJECTED_LOCAL)
-        df_acc = pd.DataFrame(accepted_json)
-        df_rej = pd.DataFrame(rejected_json)
-        tmp_acc_xlsx = write_temp_excel(df_acc, EXCEL_ACCEPTED_LOCAL)
-        tmp_rej_xlsx = write_temp_excel(df_rej, EXCEL_REJECTED_LOCAL)
-
         # Mapping: (tmp_local, final_local, onedrive_path)
-        tmp_map = [
-            (tmp_acc_xlsx, EXCEL_ACCEPTED_LOCAL, EXCEL_ACCEPTED_ONEDRIVE),
-            (tmp_rej_xlsx, EXCEL_REJECTED_LOCAL, EXCEL_REJECTED_ONEDRIVE),
-            (tmp_acc_json, JSON_ACCEPTED_LOCAL, JSON_ACCEPTED_ONEDRIVE),
-            (tmp_rej_json, JSON_REJECTED_LOCAL, JSON_REJECTED_ONEDRIVE),
-            (tmp_state, STATE_LOCAL, STATE_ONEDRIVE_PATH),
-        ]
+        tmp_map = []
+        if snapshot:
+            # Prepare temp files for upload/commit
+            tmp_state = write_temp_json(state, STATE_LOCAL)
+            tmp_acc_json = write_temp_json(listing_file(accepted_json, run_id), JSON_ACCEPTED_LOCAL)
+            tmp_rej_json = write_temp_json(listing_file(rejected_json, run_id), JSON_REJECTED_LOCAL)
+            if xlsx:
+                tmp_map += [
+                    (write_temp_excel(accepted_json, EXCEL_ACCEPTED_LOCAL), EXCEL_ACCEPTED_LOCAL, EXCEL_ACCEPTED_ONEDRIVE),
+                    (write_temp_excel(rejected_json, EXCEL_REJECTED_LOCAL), EXCEL_REJECTED_LOCAL, EXCEL_REJECTED_ONEDRIVE),
+                ]
+            tmp_map += [
+                (tmp_acc_json, JSON_ACCEPTED_LOCAL, JSON_ACCEPTED_ONEDRIVE),
+                (tmp_rej_json, JSON_REJECTED_LOCAL, JSON_REJECTED_ONEDRIVE),
+            ]
+        else:
+            tmp_map.append((write_temp_json(delta, JOURNAL_LAST_DELTA_LOCAL), JOURNAL_LAST_DELTA_LOCAL,
+                            f"{JOURNAL_ONEDRIVE_DIR}/delta-{delta['base']}-{run_id}.json"))
+        for local, remote in price_history_files():
+            if os.path.exists(local) and (local in price_files or (snapshot and not _PRICE_HISTORY_SYNC["failed"])):
+                tmp_map.append((copy_to_temp(local), local, remote))
+        if snapshot and os.path.exists(SIMINDEX_LOCAL):
+            tmp_map.append((copy_to_temp(SIMINDEX_LOCAL), SIMINDEX_LOCAL, SIMINDEX_ONEDRIVE))
+        if snapshot:
+            # state.json names the snapshot the remote deltas belong to: it goes up last, once
+            # every other file of the snapshot is on OneDrive
+            tmp_map.append((tmp_state, STATE_LOCAL, STATE_ONEDRIVE_PATH))
 
         # Refresh token right before upload (in case previous token expired during scraping)
-        refreshed = authenticate_onedrive()
+        refreshed = get_onedrive_token()
         if not refreshed:
-            abort_with_notification("OneDrive auth failed before upload — aborting without modifying local files.")
+            for tmp_local, _, _ in tmp_map:
+                if os.path.exists(tmp_local):
+                    os.remove(tmp_local)
+            return fail("OneDrive auth failed before upload — aborting without modifying local files.")
         ok = upload_temps_and_commit(refreshed, tmp_map)
         if not ok:
-            abort_with_notification("OneDrive upload failed — aborting without modifying local files.")
+            return fail("OneDrive upload failed — aborting without modifying local files.")
         # on success upload_temps_and_commit already replaced temps -> local files committed
-    else:
+        if snapshot:
+            prune_remote_journal(refreshed, run_id)
+    elif snapshot:
         # No token -> commit locally immediately (atomic)
-        df_acc = pd.DataFrame(accepted_json)
-        df_rej = pd.DataFrame(rejected_json)
         atomic_save_json(state, STATE_LOCAL)
-        atomic_save_json(accepted_json, JSON_ACCEPTED_LOCAL)
-        atomic_save_json(rejected_json, JSON_REJECTED_LOCAL)
-        atomic_save_excel(df_acc, EXCEL_ACCEPTED_LOCAL)
-        atomic_save_excel(df_rej, EXCEL_REJECTED_LOCAL)
+        atomic_save_json(listing_file(accepted_json, run_id), JSON_ACCEPTED_LOCAL)
+        atomic_save_json(listing_file(rejected_json, run_id), JSON_REJECTED_LOCAL)
+        if xlsx:
+            atomic_save_excel(accepted_json, EXCEL_ACCEPTED_LOCAL)
+            atomic_save_excel(rejected_json, EXCEL_REJECTED_LOCAL)
+
+    if snapshot:
+        write_journal([])
+        print(f"📸 Snapshot {run_id} published ({len(accepted_json)} accepted, {len(rejected_json)} rejected).")
+    else:
+        append_journal(delta)
+        print(f"🧾 Delta {run_id} published ({delta_size(delta)} row changes, snapshot {delta['base']} + {journal['runs_since_snapshot']} deltas).")
+
+    store["state"] = state
+    store["has_state"] = True
+    store["baseline"] = journal_baseline(store)
+    return True
+
+def queue_notifications(store, run):
+    to_notify = run["new_accepted"] + run["price_changed"]
+    if PRICE_DROP_ALERT_PCT > 0 and run["price_changed"]:
+        # price-drop rule: keep only changes that drop >= PRICE_DROP_ALERT_PCT vs recent history
+        ph = get_price_history(store)
+        skipped = set()
+        for row in run["price_changed"]:
+            drop = price_drop_pct(ph, row.get("NormLink"), normalize_price(row.get("Price")))
+            if drop is None or drop < PRICE_DROP_ALERT_PCT:
+                skipped.add(id(row))
+            else:
+                row["Title"] = row["Title"].replace("⚠️ Price changed", f"⚠️ Price dropped {drop:.0f}%")
+        if skipped:
+            print(f"ℹ️ {len(skipped)} price changes below the {PRICE_DROP_ALERT_PCT:g}% drop rule — not notified.")
+        to_notify = [row for row in to_notify if id(row) not in skipped]
+    store["pending_notify"].extend(to_notify)
 
+def send_pending_notifications(store):
     # 🔄 Notifications
-    to_notify = new_accepted + price_changed
+    to_notify = store["pending_notify"]
+    store["pending_notify"] = []
     if to_notify:
         print(f"🔔 New accepted listings or price changes: {len(to_notify)} - sending notifications")
         for item in to_notify:
@@ -927,7 +2389,732 @@ def main():
     else:
         print("ℹ️ No new accepted listings or price changes")
 
+# ---- Main run ----
+__version__ = "1.1.0"
+__version_date__ = "2026-10-19"
+
+def main(full_sweep=False, snapshot=False):
+    print(f"main.py v{__version__} ({__version_date__})")
+
+    print("🚀 OLX scraper starting")
+    token = get_onedrive_token()
+
+    # If we have OneDrive token, try to download remote files.
+    if token:
+        with profile_phase("download"):
+            download_store_files(token)
+    else:
+        print("⚠️ No OneDrive token — using local files if present.")
+
+    with profile_phase("load"):
+        store = load_store()
+    run = new_run()
+    scrape_searches(SEARCHES, store, run, full_sweep=full_sweep)
+
+    # --- REMOVE/UPDATE ENTRIES NOT FOUND IN CURRENT RUN ---
+    with profile_phase("missing"):
+        apply_missing_counters(store, run)
+
+    # Save state locally only AFTER successful upload to OneDrive.
+    with profile_phase("persist"):
+        persist_store(store, token, snapshot=snapshot)
+
+    with profile_phase("notify"):
+        queue_notifications(store, run)
+        send_pending_notifications(store)
+
     print("✅ Done.")
 
+# ---- Daemon mode ----
+def next_poll_delay(search_conf):
+    """Seconds until the next poll of a search: its own interval (or POLL_INTERVAL) with +/- POLL_JITTER."""
+    interval = search_conf.get("interval") or POLL_INTERVAL
+    return max(60.0, interval * (1 + random.uniform(-POLL_JITTER, POLL_JITTER)))
+
+def run_daemon():
+    """
+    Long-running service mode: auth token, HTTP session, listing maps and compiled filters stay
+    in memory; each entry in SEARCHES is polled on its own schedule and the store is persisted
+    after every poll. Only rows of the polled search are aged by MissingCount.
+    """
+    print(f"main.py v{__version__} ({__version_date__})")
+    print("🛰️ OLX scraper starting in daemon mode")
+    token = get_onedrive_token()
+    if token:
+        with profile_phase("download"):
+            download_store_files(token)
+    else:
+        print("⚠️ No OneDrive token — using local files if present.")
+    with profile_phase("load"):
+        store = load_store()
+
+    # stagger the first polls a little so searches do not start in lockstep
+    schedule = []
+    now = time.time()
+    for idx, search_conf in enumerate(SEARCHES):
+        heapq.heappush(schedule, (now + idx * random.uniform(5, 30), idx))
+
+    try:
+        while schedule:
+            due, idx = heapq.heappop(schedule)
+            wait = due - time.time()
+            if wait > 0:
+                time.sleep(wait)
+            search_conf = SEARCHES[idx]
+            name = search_conf["name"]
+            print(f"⏱️ Polling '{name}'")
+            try:
+                run = new_run()
+                scrape_searches([search_conf], store, run)
+                with profile_phase("missing"):
+                    apply_missing_counters(store, run, search_names={name})
+                queue_notifications(store, run)
+                token = get_onedrive_token() if (CLIENT_ID and REFRESH_TOKEN) else None
+                with profile_phase("persist"):
+                    persisted = persist_store(store, token, abort=False)
+                if persisted:
+                    with profile_phase("notify"):
+                        send_pending_notifications(store)
+                else:
+                    print(f"⚠️ Persist failed — {len(store['pending_notify'])} notifications kept for the next poll.")
+            except Exception as e:
+                print(f"❌ Poll of '{name}' failed: {e}")
+            delay = next_poll_delay(search_conf)
+            print(f"💤 Next poll of '{name}' in {int(delay)}s")
+            heapq.heappush(schedule, (time.time() + delay, idx))
+    except KeyboardInterrupt:
+        print("👋 Daemon stopped.")
+
+# ---- Distributed mode (shared work queue) ----
+# The coordinator enqueues one "page" unit per search URL; workers claim units with a lease,
+# fetch them and enqueue the next page and "listing" units for unknown or repriced ads (one
+# per normalized link, so overlapping searches and workers never fetch a listing twice).
+# The merge step replays the stored results through classify_candidates and
+# apply_missing_counters exactly like a single-process run.
+# Limits: QUEUE_DB is a plain SQLite file. Workers on one host are safe. Workers on other boxes
+# need QUEUE_DB on a network filesystem with working POSIX byte-range locks (e.g. NFSv4 with
+# locking enabled; many SMB/NFS setups and sync folders like OneDrive/Dropbox do not qualify)
+# and may then still hit "database is locked" under load. The default rollback journal is
+# used because WAL needs shared memory and only works when every process is on one host;
+# QUEUE_WAL=1 turns WAL on for single-host setups.
+
+def queue_connect(path=None):
+    conn = sqlite3.connect(path or QUEUE_DB, timeout=30, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    conn.execute(f"PRAGMA journal_mode={'WAL' if QUEUE_WAL else 'DELETE'}")
+    conn.executescript("""
+        CREATE TABLE IF NOT EXISTS runs (
+            run_id TEXT PRIMARY KEY, created REAL, status TEXT
+        );
+        CREATE TABLE IF NOT EXISTS units (
+            run_id TEXT, kind TEXT, key TEXT, payload TEXT,
+            status TEXT DEFAULT 'pending', owner TEXT, lease_until REAL DEFAULT 0,
+            attempts INTEGER DEFAULT 0, result TEXT,
+            PRIMARY KEY (run_id, kind, key)
+        );
+        CREATE INDEX IF NOT EXISTS units_claim ON units (run_id, status, lease_until);
+        CREATE TABLE IF NOT EXISTS known (
+            run_id TEXT, link TEXT, price TEXT, PRIMARY KEY (run_id, link)
+        );
+    """)
+    return conn
+
+def queue_add_unit(conn, run_id, kind, key, payload):
+    # INSERT OR IGNORE: a unit (e.g. a listing surfaced by several searches) is queued once
+    conn.execute("INSERT OR IGNORE INTO units (run_id, kind, key, payload) VALUES (?, ?, ?, ?)",
+                 (run_id, kind, key, json.dumps(payload, ensure_ascii=False)))
+
+def queue_open_run(conn):
+    row = conn.execute("SELECT run_id FROM runs WHERE status = 'open' ORDER BY created DESC LIMIT 1").fetchone()
+    return row["run_id"] if row else None
+
+def enqueue_run(conn, store, searches=None):
+    """Start a queued run: snapshot known listing prices and enqueue page 1 of every search URL."""
+    run_id = str(int(time.time()))
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        # one run at a time: older runs (merged or abandoned) are dropped
+        conn.execute("DELETE FROM units")
+        conn.execute("DELETE FROM known")
+        conn.execute("DELETE FROM runs")
+        conn.execute("INSERT INTO runs (run_id, created, status) VALUES (?, ?, 'open')", (run_id, time.time()))
+        known = {}
+        for row in store["rejected_json"] + store["accepted_json"]:
+            link = row.get("NormLink") or normalize_link(row.get("Link"))
+            if link:
+                known[link] = row.get("Price")
+        # accepted rows win over rejected ones, like the accepted_map lookup in classify_candidates
+        for link, row in store["accepted_map"].items():
+            known[link] = row.get("Price")
+        conn.executemany("INSERT INTO known (run_id, link, price) VALUES (?, ?, ?)",
+                         [(run_id, link, price) for link, price in known.items()])
+        units = 0
+        for order, search_conf in enumerate(searches or SEARCHES):
+            for base_url in search_conf.get("urls", [search_conf.get("url")]):
+                if not base_url:
+                    continue
+                queue_add_unit(conn, run_id, "page", f"{search_conf['name']}|{base_url}|1",
+                               {"search": search_conf["name"], "order": order, "url": base_url, "page": 1, "empty": 0})
+                units += 1
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    print(f"📥 Queued run {run_id}: {units} search URLs, {len(known)} known listings.")
+    return run_id
+
+def queue_claim(conn, run_id, owner):
+    """Lease one pending (or lease-expired) unit to owner; returns the row or None."""
+    now = time.time()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        row = conn.execute("""
+            SELECT rowid, kind, key, payload, attempts FROM units
+            WHERE run_id = ? AND (status = 'pending' OR (status = 'leased' AND lease_until < ?))
+            ORDER BY kind = 'page', rowid LIMIT 1
+        """, (run_id, now)).fetchone()
+        if row is None:
+            conn.execute("COMMIT")
+            return None
+        if row["attempts"] >= UNIT_MAX_ATTEMPTS:
+            conn.execute("UPDATE units SET status = 'failed' WHERE rowid = ?", (row["rowid"],))
+            conn.execute("COMMIT")
+            print(f"❌ Unit {row['kind']} {row['key']} failed after {row['attempts']} attempts.")
+            return queue_claim(conn, run_id, owner)
+        conn.execute("UPDATE units SET status = 'leased', owner = ?, lease_until = ?, attempts = attempts + 1 WHERE rowid = ?",
+                     (owner, now + LEASE_SECONDS, row["rowid"]))
+        conn.execute("COMMIT")
+        return row
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+
+def queue_complete(conn, rowid, owner, result):
+    conn.execute("UPDATE units SET status = 'done', result = ? WHERE rowid = ? AND owner = ?",
+                 (json.dumps(result, ensure_ascii=False), rowid, owner))
+
+def queue_counts(conn, run_id):
+    rows = conn.execute("SELECT status, COUNT(*) AS n FROM units WHERE run_id = ? GROUP BY status", (run_id,))
+    return {row["status"]: row["n"] for row in rows}
+
+def process_page_unit(conn, run_id, payload):
+    """Fetch one search page, queue the next page and listing units; returns the unit result."""
+    url, page = payload["url"], payload["page"]
+    paged = url + (f"&page={page}" if "?" in url else f"?page={page}")
+    print(" - Fetching", paged)
+    r = get_with_retry(paged)
+    results, total = parse_search_page(r.text) if r is not None else ([], None)
+    empty = 0 if results else payload["empty"] + 1
+    if page < MAX_PAGES and empty < MAX_EMPTY_PAGES:
+        nxt = dict(payload, page=page + 1, empty=empty)
+        queue_add_unit(conn, run_id, "page", f"{payload['search']}|{url}|{page + 1}", nxt)
+    for res in results:
+        norm_link = normalize_link(res.get("link"))
+        if not norm_link:
+            continue
+        # same skip rule as classify_candidates: stored with an equal price -> no listing fetch
+        known = conn.execute("SELECT price FROM known WHERE run_id = ? AND link = ?", (run_id, norm_link)).fetchone()
+        price_raw = res.get("price")
+        if known and prices_equal(normalize_price(known["price"]), known["price"], normalize_price(price_raw), price_raw):
+            continue
+        queue_add_unit(conn, run_id, "listing", norm_link, {"link": res["link"]})
+    time.sleep(random.uniform(1.5, 3.0))
+    return {"ok": r is not None, "results": results, "total": total}
+
+def process_listing_unit(payload):
+    details = fetch_listing_details(payload["link"])
+    if details is None:
+        return {"ok": False}
+    description, image_url = details
+    return {"ok": True, "description": description, "image": image_url}
+
+def work_queue(conn, run_id, owner, wait=True):
+    """Claim and process units of run_id until none is left (wait=True also waits for other workers' leases)."""
+    done = 0
+    while True:
+        unit = queue_claim(conn, run_id, owner)
+        if unit is None:
+            counts = queue_counts(conn, run_id)
+            if not wait or not counts.get("leased"):
+                return done
+            time.sleep(5)
+            continue
+        payload = json.loads(unit["payload"])
+        try:
+            if unit["kind"] == "page":
+                result = process_page_unit(conn, run_id, payload)
+            else:
+                result = process_listing_unit(payload)
+        except Exception as e:
+            # leave the lease to expire: another worker (or this one) retries the unit
+            print(f"⚠️ Unit {unit['kind']} {unit['key']} failed: {e}")
+            continue
+        queue_complete(conn, unit["rowid"], owner, result)
+        done += 1
+
+def run_worker():
+    """Worker process: serve the open queued run, exit after WORKER_IDLE_EXIT seconds without work."""
+    owner = f"{socket.gethostname()}:{os.getpid()}"
+    print(f"👷 Worker {owner} using {QUEUE_DB}")
+    conn = queue_connect()
+    idle_since = time.time()
+    while time.time() - idle_since < WORKER_IDLE_EXIT:
+        run_id = queue_open_run(conn)
+        if run_id and work_queue(conn, run_id, owner, wait=False):
+            idle_since = time.time()
+        time.sleep(5)
+    print("👷 No work left — worker exiting.")
+
+def merge_queue_run(conn, run_id, store):
+    """Rebuild a run from finished units and classify it into the store; returns the run."""
+    run = new_run()
+    searches = {c["name"]: c for c in SEARCHES}
+    # every page unit counts for coverage: failed (or never finished) pages leave their URL uncovered
+    pages = conn.execute("SELECT payload, result, status FROM units WHERE run_id = ? AND kind = 'page'", (run_id,)).fetchall()
+    pages = sorted(((json.loads(p["payload"]), json.loads(p["result"]) if p["status"] == "done" else {"ok": False})
+                    for p in pages), key=lambda pr: (pr[0]["order"], pr[0]["url"], pr[0]["page"]))
+    for payload, result in pages:
+        name = payload["search"]
+        if name not in searches:
+            continue
+        run["search_confs"][name] = searches[name]
+        cov = coverage_entry(run, payload["url"])
+        results = result.get("results", [])
+        cov["pages"][payload["page"]] = "failed" if not result.get("ok") else ("ok" if results else "empty")
+        if result.get("total") is not None:
+            cov["total"] = max(cov["total"] or 0, result["total"])
+        for res in results:
+            register_result(res, name, run, url=payload["url"])
+    for name in run["search_confs"]:
+        store["seen_by_search"][name] = set(run["found_by_search"][name])
+
+    details = {}
+    for row in conn.execute("SELECT key, result FROM units WHERE run_id = ? AND kind = 'listing' AND status = 'done'", (run_id,)):
+        result = json.loads(row["result"])
+        if result.get("ok"):
+            details[row["key"]] = (result.get("description", ""), result.get("image"))
+    classify_candidates(store, run, fetch_details=lambda link: details.get(normalize_link(link)))
+    return run
+
+def run_coordinator():
+    """
+    Coordinator: queue a run, work on it alongside any --worker processes, then merge the
+    results into accepted/rejected/state (MissingCount included) and notify.
+    """
+    print(f"main.py v{__version__} ({__version_date__})")
+    print("🧭 OLX scraper coordinator starting")
+    token = get_onedrive_token()
+    if token:
+        download_store_files(token)
+    else:
+        print("⚠️ No OneDrive token — using local files if present.")
+    store = load_store()
+
+    conn = queue_connect()
+    run_id = enqueue_run(conn, store)
+    owner = f"{socket.gethostname()}:{os.getpid()}:coordinator"
+    with profile_phase("work"):
+        work_queue(conn, run_id, owner, wait=True)
+    counts = queue_counts(conn, run_id)
+    print(f"📊 Queue finished: {counts}")
+
+    with profile_phase("merge"):
+        run = merge_queue_run(conn, run_id, store)
+        apply_missing_counters(store, run)
+    with profile_phase("persist"):
+        persist_store(store, get_onedrive_token())
+    conn.execute("UPDATE runs SET status = 'merged' WHERE run_id = ?", (run_id,))
+
+    queue_notifications(store, run)
+    send_pending_notifications(store)
+    print("✅ Done.")
+
+# ---- Query index (read-only listing queries) ----
+# output/listings.db mirrors accepted/rejected rows (snapshot + journal) with indexes on search, numeric price
+# (normalize_price), Timestamp and Negotiable. Persists do not touch it; --query/--serve rebuild
+# it on open whenever the JSON files or the journal changed since the last build.
+
+def query_index_sources():
+    return {path: os.path.getmtime(path) for path in (JSON_ACCEPTED_LOCAL, JSON_REJECTED_LOCAL, JOURNAL_LOCAL) if os.path.exists(path)}
+
+def build_query_index(accepted_json, rejected_json, path=None):
+    """(Re)build the query index from accepted/rejected rows (atomic replace of the db file)."""
+    path = path or QUERY_DB
+    dirn = os.path.dirname(path) or "."
+    fd, tmp = tempfile.mkstemp(dir=dirn, prefix=".tmp_", suffix=".db")
+    os.close(fd)
+    conn = sqlite3.connect(tmp)
+    try:
+        conn.executescript("""
+            CREATE TABLE listings (
+                link TEXT PRIMARY KEY, status TEXT, search_name TEXT, price INTEGER,
+                negotiable INTEGER, ts INTEGER, row TEXT
+            );
+            CREATE TABLE listing_searches (
+                search_name TEXT, link TEXT, accepted INTEGER, PRIMARY KEY (search_name, link)
+            );
+            CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT);
+        """)
+        listings = {}
+        searches = {}
+        for status, rows in (("rejected", rejected_json), ("accepted", accepted_json)):
+            for row in rows:
+                link = row.get("NormLink") or normalize_link(row.get("Link"))
+                if not link:
+                    continue
+                # later rows win (same rule as the in-memory link maps)
+                listings[link] = (link, status, row.get("SearchName"), normalize_price(row.get("Price")),
+                                  1 if row.get("Negotiable") else 0, int(row.get("Timestamp") or 0),
+                                  json.dumps(row, ensure_ascii=False))
+                for name, ok in stored_verdicts(row, status == "accepted").items():
+                    searches[(name, link)] = (name, link, 1 if ok else 0)
+        conn.executemany("INSERT INTO listings VALUES (?, ?, ?, ?, ?, ?, ?)", listings.values())
+        conn.executemany("INSERT INTO listing_searches VALUES (?, ?, ?)", searches.values())
+        conn.executescript("""
+            CREATE INDEX listings_search ON listings (search_name, ts);
+            CREATE INDEX listings_price ON listings (price);
+            CREATE INDEX listings_ts ON listings (ts);
+            CREATE INDEX listings_negotiable ON listings (negotiable, ts);
+            CREATE INDEX listings_status ON listings (status, ts);
+        """)
+        conn.execute("INSERT INTO meta VALUES ('sources', ?)", (json.dumps(query_index_sources()),))
+        conn.commit()
+    finally:
+        conn.close()
+    os.replace(tmp, path)
+    return len(listings)
+
+def open_query_index():
+    """Read-only connection to the query index, rebuilding it first when the JSON files changed."""
+    fresh = False
+    if os.path.exists(QUERY_DB):
+        try:
+            conn = sqlite3.connect(f"file:{QUERY_DB}?mode=ro", uri=True)
+            row = conn.execute("SELECT value FROM meta WHERE key = 'sources'").fetchone()
+            conn.close()
+            fresh = row is not None and json.loads(row[0]) == query_index_sources()
+        except sqlite3.Error:
+            fresh = False
+    if not fresh:
+        n = build_query_index(*load_listings())
+        print(f"ℹ️ Query index rebuilt ({n} listings).", file=sys.stderr)
+    conn = sqlite3.connect(f"file:{QUERY_DB}?mode=ro", uri=True, check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+def parse_since(value):
+    """'7' / '7d' -> 7 days ago, '12h' -> 12 hours ago, '2025-12-01' -> that date; returns a unix timestamp."""
+    value = str(value).strip()
+    m = re.fullmatch(r"(\d+)\s*([dh]?)", value)
+    if m:
+        seconds = int(m.group(1)) * (3600 if m.group(2) == "h" else 86400)
+        return int(time.time()) - seconds
+    return int(datetime.datetime.fromisoformat(value).timestamp())
+
+def query_listings(conn, search=None, min_price=None, max_price=None, since=None, until=None,
+                   negotiable=None, status="accepted", sort="newest", limit=50, page=1):
+    """Filtered, paginated listing query -> {"total", "page", "limit", "items"}."""
+    where, params = [], []
+    if status in ("accepted", "rejected"):
+        where.append("l.status = ?")
+        params.append(status)
+    if search:
+        # a search matches rows it surfaced (per-search verdicts) as well as their SearchName
+        where.append("(l.search_name = ? OR l.link IN (SELECT link FROM listing_searches WHERE search_name = ?))")
+        params += [search, search]
+    if min_price is not None:
+        where.append("l.price >= ?")
+        params.append(min_price)
+    if max_price is not None:
+        where.append("l.price <= ?")
+        params.append(max_price)
+    if since is not None:
+        where.append("l.ts >= ?")
+        params.append(since)
+    if until is not None:
+        where.append("l.ts < ?")
+        params.append(until)
+    if negotiable is not None:
+        where.append("l.negotiable = ?")
+        params.append(1 if negotiable else 0)
+    clause = f"WHERE {' AND '.join(where)}" if where else ""
+    order = {"newest": "l.ts DESC", "oldest": "l.ts ASC", "price": "l.price ASC", "price-desc": "l.price DESC"}.get(sort, "l.ts DESC")
+    limit = max(1, min(int(limit), 1000))
+    page = max(1, int(page))
+    total = conn.execute(f"SELECT COUNT(*) FROM listings l {clause}", params).fetchone()[0]
+    rows = conn.execute(f"SELECT l.status, l.row FROM listings l {clause} ORDER BY {order} LIMIT ? OFFSET ?",
+                        params + [limit, (page - 1) * limit]).fetchall()
+    items = []
+    for r in rows:
+        item = json.loads(r["row"])
+        item["Status"] = r["status"]
+        items.append(item)
+    return {"total": total, "page": page, "limit": limit, "items": items}
+
+def query_params_from_args(args):
+    negotiable = {"yes": True, "no": False}.get(args.negotiable)
+    return {
+        "search": args.search, "min_price": args.min_price, "max_price": args.max_price,
+        "since": parse_since(args.since) if args.since else None, "negotiable": negotiable,
+        "status": args.status, "sort": args.sort, "limit": args.limit, "page": args.page,
+    }
+
+def run_query(args):
+    conn = open_query_index()
+    print(json.dumps(query_listings(conn, **query_params_from_args(args)), ensure_ascii=False, indent=2))
+
+def run_query_server(port):
+    """Serve GET /listings?search=&min_price=&max_price=&since=&negotiable=&status=&sort=&limit=&page= as JSON."""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+    from urllib.parse import urlparse, parse_qs
+
+    conn = open_query_index()
+    lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            nonlocal conn
+            url = urlparse(self.path)
+            if url.path.rstrip("/") not in ("", "/listings"):
+                return self.reply(404, {"error": "not found"})
+            q = {k: v[-1] for k, v in parse_qs(url.query).items()}
+            try:
+                params = {
+                    "search": q.get("search"),
+                    "min_price": int(q["min_price"]) if q.get("min_price") else None,
+                    "max_price": int(q["max_price"]) if q.get("max_price") else None,
+                    "since": parse_since(q["since"]) if q.get("since") else None,
+                    "negotiable": {"yes": True, "1": True, "no": False, "0": False}.get(q.get("negotiable", "")),
+                    "status": q.get("status", "accepted"),
+                    "sort": q.get("sort", "newest"),
+                    "limit": int(q.get("limit", 50)),
+                    "page": int(q.get("page", 1)),
+                }
+            except ValueError as e:
+                return self.reply(400, {"error": str(e)})
+            with lock:
+                if query_index_sources() != json.loads(conn.execute("SELECT value FROM meta WHERE key = 'sources'").fetchone()[0]):
+                    conn.close()
+                    conn = open_query_index()
+                result = query_listings(conn, **params)
+            self.reply(200, result)
+
+        def reply(self, code, body):
+            data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, fmt, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+    print(f"🔍 Query API on http://127.0.0.1:{port}/listings")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("👋 Query API stopped.")
+
+# ---- Offline re-classification (--reclassify) ----
+# Re-judges every stored row against the current SEARCHES filters using the stored Title,
+# Description and Price (no OLX requests). A filter word without spaces can only match inside a
+# single token of the normalized text, so single words are matched once against the corpus
+# vocabulary (far smaller than the text) with the trie-compiled regex, and a row matches when
+# its token set meets the matched tokens. A phrase with spaces is only searched in the rows that
+# hold its first/last parts as token suffix/prefix and its middle parts as tokens.
+# A row is re-judged only for the searches that judged it before (row["Searches"]).
+# bench_reclassify.py measures this against the row-by-row passes_filters loop.
+
+def batch_match_rows(pattern, blob, starts):
+    """Indexes of the rows (blob segments beginning at starts) that contain a match of pattern."""
+    hits = set()
+    if pattern is None:
+        return hits
+    pos = 0
+    while True:
+        m = pattern.search(blob, pos)
+        if m is None:
+            return hits
+        idx = bisect.bisect_right(starts, m.start()) - 1
+        hits.add(idx)
+        # one match per row is enough: continue at the next row
+        pos = starts[idx + 1] if idx + 1 < len(starts) else len(blob)
+
+def joined_segments(texts):
+    """texts joined by "\n" (normalized texts never contain one) and the start offset of each."""
+    starts = []
+    pos = 0
+    for text in texts:
+        starts.append(pos)
+        pos += len(text) + 1
+    return "\n".join(texts), starts
+
+def vocab_matching(pattern, corpus):
+    """Tokens of the corpus vocabulary that contain a match of pattern."""
+    if "vocab" not in corpus:
+        corpus["vocab"] = sorted(set().union(*corpus["tokens"]))
+        corpus["vocab_blob"], corpus["vocab_starts"] = joined_segments(corpus["vocab"])
+    vocab = corpus["vocab"]
+    return {vocab[i] for i in batch_match_rows(pattern, corpus["vocab_blob"], corpus["vocab_starts"])}
+
+def rows_with_tokens(tokens, corpus):
+    if not tokens:
+        return set()
+    return {i for i, row_tokens in enumerate(corpus["tokens"]) if not tokens.isdisjoint(row_tokens)}
+
+def rows_matching(words, corpus):
+    """Indexes of the corpus rows whose normalized text contains any of the normalized words."""
+    if "" in words:
+        # an empty word (a filter word without letters or digits) matches every text
+        return set(range(len(corpus["tokens"])))
+    hits = set()
+    single = [w for w in words if " " not in w]
+    if single:
+        hits |= rows_with_tokens(vocab_matching(compile_word_filter(single), corpus), corpus)
+    for phrase in (w for w in words if " " in w):
+        # "a b c" needs a token ending in "a", the token "b" and a token starting with "c":
+        # only rows with all of them are normalized and searched
+        parts = phrase.split(" ")
+        candidates = rows_with_tokens(vocab_matching(re.compile(re.escape(parts[0]) + "$", re.M), corpus), corpus)
+        candidates &= rows_with_tokens(vocab_matching(re.compile("^" + re.escape(parts[-1]), re.M), corpus), corpus)
+        for part in parts[1:-1]:
+            candidates &= rows_with_tokens({part}, corpus)
+        candidates -= hits
+        hits.update(i for i in candidates if phrase in normalize_text(corpus["texts"][i]))
+    return hits
+
+def reclassify_store(store, search_confs=None):
+    """
+    Re-run the filters over accepted+rejected rows, move rows whose overall verdict changed and
+    return the diff {"rows", "to_accepted", "to_rejected", "verdicts_changed"}.
+    """
+    search_confs = {c["name"]: c for c in (search_confs or SEARCHES)}
+    rows = [(row, True) for row in store["accepted_json"]] + [(row, False) for row in store["rejected_json"]]
+    verdicts = [stored_verdicts(row, accepted) for row, accepted in rows]
+
+    texts = [row.get("Title", "") + " " + row.get("Description", "") for row, _ in rows]
+    # the tokens of normalize_text(text) without building the normalized text
+    corpus = {"texts": texts, "tokens": [_TOKEN_RE.findall(text.lower()) for text in texts]}
+    prices = [filter_price(row.get("Price", "")) for row, _ in rows]
+
+    new_verdicts = [dict(v) for v in verdicts]
+    for name, conf in search_confs.items():
+        members = [i for i, v in enumerate(verdicts) if name in v]
+        if not members:
+            continue
+        forbidden = rows_matching([normalize_text(w) for w in conf.get("forbidden_words", [])], corpus)
+        required_words = [normalize_text(w) for w in conf.get("required_words", [])]
+        required = rows_matching(required_words, corpus) if required_words else None
+        maxp, minp = conf.get("max_price"), conf.get("min_price")
+        for i in members:
+            p = prices[i]
+            new_verdicts[i][name] = (i not in forbidden
+                                     and (required is None or i in required)
+                                     and not (p is not None and maxp is not None and p > maxp)
+                                     and not (p is not None and minp is not None and p < minp))
+
+    accepted_json, rejected_json = [], []
+    diff = {"rows": len(rows), "to_accepted": [], "to_rejected": [], "verdicts_changed": 0}
+    for (row, was_accepted), old, new in zip(rows, verdicts, new_verdicts):
+        if new != old:
+            diff["verdicts_changed"] += 1
+            row["Searches"] = new
+        now_accepted = any(new.values()) if new else was_accepted
+        if now_accepted and not was_accepted:
+            row["SearchName"] = next(n for n, ok in new.items() if ok)
+            diff["to_accepted"].append(row)
+        elif was_accepted and not now_accepted:
+            diff["to_rejected"].append(row)
+        (accepted_json if now_accepted else rejected_json).append(row)
+
+    store["accepted_json"][:] = accepted_json
+    store["rejected_json"][:] = rejected_json
+    store["accepted_map"] = build_link_map(store["accepted_json"])
+    store["rejected_map"] = build_link_map(store["rejected_json"])
+    return diff
+
+def run_reclassify(dry_run=False):
+    """--reclassify [--dry-run]: re-judge the synced listings offline, report the diff and persist it (not with --dry-run)."""
+    print(f"main.py v{__version__} ({__version_date__})")
+    print("🔁 Re-classifying stored listings with the current filters" + (" (dry run)" if dry_run else ""))
+    # dry runs sync too, so they report the moves a real run would make
+    token = get_onedrive_token()
+    if token:
+        download_store_files(token)
+    else:
+        print("⚠️ No OneDrive token — using local files if present.")
+    store = load_store()
+    started = time.perf_counter()
+    diff = reclassify_store(store)
+    elapsed = time.perf_counter() - started
+    print(f"📊 Re-classified {diff['rows']} rows in {elapsed:.2f}s: {len(diff['to_accepted'])} -> accepted, "
+          f"{len(diff['to_rejected'])} -> rejected, {diff['verdicts_changed']} with changed per-search verdicts.")
+    for label, moved in (("✅ now accepted", diff["to_accepted"]), ("🚫 now rejected", diff["to_rejected"])):
+        for row in moved:
+            print(f" {label}: [{row.get('SearchName')}] {row.get('Title')} — {row.get('Price')} — {row.get('Link')}")
+    if dry_run:
+        print("ℹ️ Dry run — nothing saved.")
+    elif diff["verdicts_changed"]:
+        persist_store(store, token)
+        print("✅ Re-classification saved.")
+    else:
+        print("ℹ️ No verdict changed — nothing to save.")
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="OLX scraper -> Excel + OneDrive + Telegram")
+    parser.add_argument("--daemon", action="store_true",
+                        help="keep running and poll each search on its own interval")
+    parser.add_argument("--full-sweep", action="store_true",
+                        help="walk all pages of every search even when INCREMENTAL_SCAN=1")
+    parser.add_argument("--snapshot", action="store_true",
+                        help="publish full snapshot files this run instead of a journal delta")
+    parser.add_argument("--profile", action="store_true",
+                        help="profile each run phase (CPU, wall-clock stacks, allocations) into output/profile/")
+    parser.add_argument("--reclassify", action="store_true",
+                        help="re-run the current SEARCHES filters over stored listings (no scraping) and save the moves")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="with --reclassify: only report what would move")
+    parser.add_argument("--coordinator", action="store_true",
+                        help="queue a run in QUEUE_DB, process it with any workers, then merge the results")
+    parser.add_argument("--worker", action="store_true",
+                        help="claim and process units of the queued run in QUEUE_DB")
+    parser.add_argument("--query", action="store_true",
+                        help="print stored listings matching the filters below as JSON")
+    parser.add_argument("--price-history", nargs="?", const=True, metavar="LINK",
+                        help="print the price history of LINK, or per-ad min/max prices (with --search/--since)")
+    parser.add_argument("--serve", type=int, metavar="PORT",
+                        help="serve the listing query as a read-only JSON API on localhost:PORT")
+    query = parser.add_argument_group("query filters")
+    query.add_argument("--search", help="search name (SearchName or any search that judged the listing)")
+    query.add_argument("--min-price", type=int)
+    query.add_argument("--max-price", type=int)
+    query.add_argument("--since", help="7d, 12h or an ISO date")
+    query.add_argument("--negotiable", choices=["yes", "no"])
+    query.add_argument("--status", choices=["accepted", "rejected", "all"], default="accepted")
+    query.add_argument("--sort", choices=["newest", "oldest", "price", "price-desc"], default="newest")
+    query.add_argument("--limit", type=int, default=50)
+    query.add_argument("--page", type=int, default=1)
+    return parser.parse_args(argv)
+
 if __name__ == "__main__":
-    main()
+    args = parse_args()
+    if args.profile:
+        enable_profiling()
+    if args.daemon:
+        run_daemon()
+    elif args.reclassify:
+        run_reclassify(dry_run=args.dry_run)
+    elif args.coordinator:
+        run_coordinator()
+    elif args.worker:
+        run_worker()
+    elif args.query:
+        run_query(args)
+    elif args.serve:
+        run_query_server(args.serve)
+    elif args.price_history:
+        run_price_history(args)
+    else:
+        main(full_sweep=args.full_sweep, snapshot=args.snapshot)
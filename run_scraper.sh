@@ -26,4 +26,4 @@ fi
 # minimal masked debug to journal (do NOT print full tokens)
 echo "ℹ️ Starting scraper; TELEGRAM_BOT_TOKEN present: ${TELEGRAM_BOT_TOKEN:+yes}, TELEGRAM_CHAT_ID present: ${TELEGRAM_CHAT_ID:+yes}"
 
-exec "$PYTHON" main.py
\ No newline at end of file
+exec "$PYTHON" main.py "$@"
\ No newline at end of file